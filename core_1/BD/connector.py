@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Protocol
+
+from sqlalchemy import select
+
+from core_1.BD.model import IN_CHUNK_SIZE, DynamicTableManager
+
+
+class DBConnector(Protocol):
+    """Интерфейс источника значений и метаданных по ID"""
+
+    def get_value(self, id) -> Any: ...
+
+    def get_values(self, ids: Iterable) -> Dict[Any, Any]:
+        """Значения для набора ID одним запросом, ID -> значение"""
+        ...
+
+    def get_metadata(self, id) -> dict: ...
+
+    def get_metadata_many(self, ids: Iterable) -> Dict[Any, dict]:
+        """Метаданные для набора ID одним запросом, ID -> метаданные"""
+        ...
+
+
+class CachedDBConnector:
+    """
+    LRU кэш ограниченного размера перед любым DBConnector.
+
+    Пакетные методы запрашивают у источника только отсутствующие в кэше ID.
+    """
+
+    def __init__(self, connector: DBConnector, maxsize: int = 100_000):
+        self.connector = connector
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._metadata = OrderedDict()
+
+    def get_value(self, id):
+        return self.get_values([id])[id]
+
+    def get_values(self, ids):
+        return self._get_many(ids, self._values, self.connector.get_values)
+
+    def get_metadata(self, id):
+        return self.get_metadata_many([id])[id]
+
+    def get_metadata_many(self, ids):
+        return self._get_many(ids, self._metadata, self.connector.get_metadata_many)
+
+    def _get_many(self, ids, cache, fetch):
+        result = {}
+        missing = []
+        for id in ids:
+            if id in cache:
+                cache.move_to_end(id)
+                result[id] = cache[id]
+            else:
+                missing.append(id)
+
+        if missing:
+            fetched = fetch(missing)
+            result.update(fetched)
+            cache.update(fetched)
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        return result
+
+
+class SQLiteDBConnector:
+    """
+    Источник значений по ID поверх таблиц DynamicTableManager.
+
+    Каждая таблица-источник задается столбцом с ID и столбцом со значением.
+    ID разрешаются пакетно запросами `WHERE id IN (...)`, а найденная
+    таблица запоминается в едином индексе ID -> таблица, поэтому повторные
+    запросы идут сразу в нужную таблицу.
+    """
+
+    def __init__(self, manager: DynamicTableManager, sources, metadata_columns=()):
+        """
+        Args:
+            manager (DynamicTableManager): Менеджер БД
+            sources (dict): Имя таблицы -> (столбец ID, столбец значения)
+            metadata_columns: Столбцы, возвращаемые в метаданных (например,
+                filename, row), если они есть в таблице
+        """
+        self.manager = manager
+        self.sources = dict(sources)
+        self.metadata_columns = tuple(metadata_columns)
+        self.id_index = {}
+
+        # Таблицы берутся из общего кэша менеджера, без повторного отражения
+        self.tables = {}
+        for name in self.sources:
+            table = manager.get_table(name)
+            if table is None:
+                raise ValueError(f"Таблица {name} не найдена")
+            self.tables[name] = table
+
+    def get_value(self, id):
+        return self.get_values([id])[id]
+
+    def get_values(self, ids):
+        return {id: row["value"] for id, row in self._resolve(ids).items()}
+
+    def get_metadata(self, id):
+        return self.get_metadata_many([id])[id]
+
+    def get_metadata_many(self, ids):
+        return {id: row["metadata"] for id, row in self._resolve(ids).items()}
+
+    def _resolve(self, ids):
+        """Найти строки для ID: сначала в известных таблицах, затем во всех"""
+        ids = list(dict.fromkeys(ids))
+        result = {}
+
+        by_table = {}
+        for id in ids:
+            by_table.setdefault(self.id_index.get(id), []).append(id)
+        unknown = by_table.pop(None, [])
+
+        with self.manager.engine.connect() as connection:
+            for name, table_ids in by_table.items():
+                result.update(self._query(connection, name, table_ids))
+            for name in self.sources:
+                if not unknown:
+                    break
+                found = self._query(connection, name, unknown)
+                result.update(found)
+                unknown = [id for id in unknown if id not in found]
+
+        if unknown:
+            raise ValueError(f"ID {unknown[0]} not found in any table")
+        return result
+
+    def _query(self, connection, name, ids):
+        """Пакетный запрос строк таблицы по ID, чанками IN (...)"""
+        table = self.tables[name]
+        id_column, value_column = self.sources[name]
+        extra = [table.c[col] for col in self.metadata_columns if col in table.c]
+        columns = [table.c[id_column], table.c[value_column], table.c["_id_"], *extra]
+
+        found = {}
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start : start + IN_CHUNK_SIZE]
+            query = select(*columns).where(table.c[id_column].in_(chunk))
+            for id, value, row_id, *extra_values in connection.execute(query):
+                metadata = {"table": name, "row": row_id}
+                metadata.update(zip((col.name for col in extra), extra_values))
+                found[id] = {"value": value, "metadata": metadata}
+                self.id_index[id] = name
+        return found
@@ -1,43 +1,990 @@
-from sqlalchemy import Column, Integer, String, MetaData, Table, create_engine
+import datetime
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+    insert,
+    inspect,
+    select,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from get_dat.CalamineLoaderExcel import has_leading_zeros
 
 Base = declarative_base()
-metadata = MetaData()
+
+# Первичный ключ динамических таблиц
+ID_COLUMN = "_id_"
+
+# Служебные столбцы инкрементальной загрузки: хэш ключа строки и хэш значений
+KEY_COLUMN = "_key_"
+HASH_COLUMN = "_hash_"
+SERVICE_COLUMNS = (ID_COLUMN, KEY_COLUMN, HASH_COLUMN)
+
+# Максимум параметров в одном IN (...), с запасом под лимит SQLite
+IN_CHUNK_SIZE = 900
+
+# Типы столбцов динамических таблиц
+COLUMN_TYPES = {
+    "int": Integer,
+    "float": Float,
+    "date": Date,
+    "datetime": DateTime,
+    "text": Text,
+}
+
+# Таблицы индекса происхождения
+LINEAGE_SOURCES = "lineage_sources"
+LINEAGE_AGGREGATES = "lineage_aggregates"
+LINEAGE_EDGES = "lineage_edges"
+
+
+class _EngineEntry:
+    """Движок БД и общие для всех менеджеров этой БД метаданные таблиц"""
+
+    __slots__ = ("engine", "metadata", "lock", "created")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.metadata = MetaData()
+        self.lock = threading.RLock()
+        # Таблицы, существование которых в БД уже проверено
+        self.created = set()
+
+
+# Реестр движков процесса: URL -> _EngineEntry
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine_entry(db_url, pool_size=5, max_overflow=10, pool_recycle=3600):
+    """
+    Движок для URL из реестра процесса, при первом обращении - создать.
+
+    SQLite в памяти работает через одно общее соединение (StaticPool), иначе
+    каждое соединение видело бы свою пустую БД. Файлы SQLite разрешено
+    использовать из разных потоков (check_same_thread=False). Для серверных
+    БД пул ограничен pool_size + max_overflow соединениями, соединения
+    проверяются перед выдачей и пересоздаются через pool_recycle секунд.
+    Параметры пула учитываются только при создании движка.
+    """
+    key = str(db_url)
+    with _ENGINES_LOCK:
+        entry = _ENGINES.get(key)
+        if entry is None:
+            entry = _ENGINES[key] = _EngineEntry(
+                _create_engine(key, pool_size, max_overflow, pool_recycle)
+            )
+        return entry
+
+
+def _create_engine(db_url, pool_size, max_overflow, pool_recycle):
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return create_engine(
+                url, connect_args=connect_args, poolclass=StaticPool
+            )
+        return create_engine(url, connect_args=connect_args)
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+def dispose_engines(db_url=None):
+    """Закрыть соединения движка db_url (по умолчанию всех) и убрать из реестра"""
+    with _ENGINES_LOCK:
+        if db_url is None:
+            entries = list(_ENGINES.values())
+            _ENGINES.clear()
+        else:
+            entry = _ENGINES.pop(str(db_url), None)
+            entries = [entry] if entry is not None else []
+    for entry in entries:
+        entry.engine.dispose()
 
 
 class DynamicTableManager:
     def __init__(self, db_url):
-        self.engine = create_engine(db_url)
+        self._entry = get_engine_entry(db_url)
+        self.engine = self._entry.engine
         self.Session = sessionmaker(bind=self.engine)
-        self.metadata = metadata
+        self.metadata = self._entry.metadata
+
+    def get_table(self, table_name):
+        """
+        Таблица по имени: из кэша метаданных, иначе отражается из БД.
+
+        Returns:
+            Table | None: None, если таблицы в БД нет
+        """
+        entry = self._entry
+        with entry.lock:
+            table = self.metadata.tables.get(table_name)
+            if table is not None and table_name in entry.created:
+                return table
+            if not inspect(self.engine).has_table(table_name):
+                return None
+            if table is None:
+                table = Table(table_name, self.metadata, autoload_with=self.engine)
+            entry.created.add(table_name)
+            return table
+
+    def create_table(
+        self,
+        table_name,
+        columns,
+        column_types=None,
+        sample=None,
+        indexes=(),
+        incremental=False,
+    ):
+        """
+        Создать таблицу с первичным ключом _id_ и указанными столбцами.
+
+        Без column_types и sample все столбцы - String. Типы берутся из
+        column_types (имя -> "int", "float", "date", "datetime", "text" или тип
+        SQLAlchemy), для остальных столбцов выводятся по sample.
+
+        Индексы только объявляются: строятся они методом create_indexes после
+        загрузки, чтобы вставка не обновляла их на каждой строке.
+
+        Если таблица уже есть (в кэше или в БД), она используется повторно без
+        DDL при условии, что в ней есть все указанные столбцы.
+
+        При incremental добавляются служебные столбцы _key_ (уникальный) и
+        _hash_ для загрузки изменений методом upsert_data.
+
+        Args:
+            table_name: Имя таблицы
+            columns: Имена столбцов
+            column_types: Типы столбцов по именам
+            sample: Образец данных (список словарей) для вывода типов
+            indexes: Столбцы для индексов, кортеж имен - составной индекс
+            incremental: Добавить столбцы для инкрементальной загрузки
+        """
+        index_columns = [
+            (index,) if isinstance(index, str) else tuple(index) for index in indexes
+        ]
+        with self._entry.lock:
+            table = self.get_table(table_name)
+            if table is not None:
+                missing = [name for name in columns if name not in table.c]
+                if missing:
+                    raise ValueError(
+                        f"В существующей таблице {table_name} нет столбцов {missing}"
+                    )
+                table.info["pending_indexes"] = index_columns
+                return table
+
+            table = self._define_table(
+                table_name, columns, column_types, sample, incremental
+            )
+            table.info["pending_indexes"] = index_columns
+            table.create(self.engine, checkfirst=True)
+            self._entry.created.add(table_name)
+            return table
+
+    def _define_table(self, table_name, columns, column_types, sample, incremental):
+        types = {}
+        if sample is not None:
+            types.update(infer_column_types(sample, columns))
+        if column_types:
+            types.update(column_types)
+
+        cols = [Column(ID_COLUMN, Integer, primary_key=True)]
+        for col_name in columns:
+            col_type = types.get(col_name)
+            if col_type is None:
+                cols.append(Column(col_name, String))
+            elif isinstance(col_type, str):
+                cols.append(Column(col_name, COLUMN_TYPES[col_type]))
+            else:
+                cols.append(Column(col_name, col_type))
 
-    def create_table(self, table_name, columns):
-        cols = [Column("_id_", Integer, primary_key=True)]
-        cols.extend([Column(col_name, String) for col_name in columns])
+        if incremental:
+            cols.append(Column(KEY_COLUMN, BigInteger, unique=True))
+            cols.append(Column(HASH_COLUMN, BigInteger))
 
-        table = Table(table_name, self.metadata, *cols)
-        self.metadata.create_all(self.engine)
-        return table
+        # Определение, оставшееся от таблицы, удаленной из БД, заменяем
+        return Table(table_name, self.metadata, *cols, extend_existing=True)
+
+    def create_indexes(self, table):
+        """Построить объявленные в create_table индексы (после загрузки данных)"""
+        created = []
+        for index_columns in table.info.get("pending_indexes", []):
+            name = f"ix_{table.name}_{'_'.join(index_columns)}"
+            index = Index(name, *(table.c[col] for col in index_columns))
+            index.create(self.engine, checkfirst=True)
+            created.append(name)
+        table.info["pending_indexes"] = []
+        return created
 
     def save_data(self, table, data_list):
-        session = self.Session()
+        self.bulk_save_data(table, data_list)
+
+    def bulk_save_data(
+        self,
+        table,
+        data_list,
+        chunk_size=10_000,
+        commit_each_chunk=False,
+        fast_mode=False,
+        raise_errors=False,
+        connection=None,
+    ):
+        """
+        Пакетная запись данных: один INSERT на пачку строк (executemany).
+
+        Args:
+            table: Таблица
+            data_list: Итерируемый набор словарей с одинаковыми ключами
+            chunk_size (int): Количество строк в одной пачке
+            commit_each_chunk (bool): Фиксировать транзакцию после каждой пачки,
+                иначе вся загрузка идет одной транзакцией
+            fast_mode (bool): Для SQLite на время загрузки включить
+                journal_mode=WAL и synchronous=OFF
+            raise_errors (bool): При ошибке после отката пробросить исключение,
+                иначе ошибка печатается, а в результате - зафиксированные строки
+            connection: Соединение из load_connection: строки пишутся в его
+                транзакцию, фиксацией и откатом управляет вызывающий код,
+                ошибки пробрасываются (остальные флаги не действуют)
+
+        Returns:
+            dict: Количество записанных строк, время и скорость (строк/сек)
+        """
+        converters = _get_converters(table)
+        if converters:
+            data_list = (_convert_row(row, converters) for row in data_list)
+        return self._bulk_execute(
+            table.insert(),
+            data_list,
+            chunk_size,
+            commit_each_chunk,
+            fast_mode,
+            raise_errors,
+            connection,
+        )
+
+    def _bulk_execute(
+        self,
+        statement,
+        data_list,
+        chunk_size,
+        commit_each_chunk=False,
+        fast_mode=False,
+        raise_errors=False,
+        connection=None,
+    ):
+        """Выполнить statement пачками параметров, см. bulk_save_data"""
+        if chunk_size <= 0:
+            raise ValueError("Размер пачки должен быть больше нуля")
+
+        saved_rows = 0
+        pending_rows = 0
+        start_time = time.perf_counter()
+
+        if connection is not None:
+            # Транзакция вызывающего кода: не фиксируем и не откатываем
+            rows = iter(data_list)
+            while chunk := list(islice(rows, chunk_size)):
+                connection.execute(statement, chunk)
+                saved_rows += len(chunk)
+            return _bulk_stats(saved_rows, start_time)
+
+        with self.engine.connect() as connection, self._fast_mode(
+            connection, fast_mode
+        ):
+            try:
+                rows = iter(data_list)
+                while chunk := list(islice(rows, chunk_size)):
+                    connection.execute(statement, chunk)
+                    pending_rows += len(chunk)
+                    if commit_each_chunk:
+                        connection.commit()
+                        saved_rows += pending_rows
+                        pending_rows = 0
+                connection.commit()
+                saved_rows += pending_rows
+            except Exception as e:
+                connection.rollback()
+                if raise_errors:
+                    raise
+                print(f"Error saving data: {e}")
+
+        return _bulk_stats(saved_rows, start_time)
+
+    @contextmanager
+    def load_connection(self, fast_mode=False):
+        """
+        Соединение для загрузки одной транзакцией (см. connection в
+        bulk_save_data): при выходе транзакция фиксируется, при ошибке -
+        откатывается.
+
+        Args:
+            fast_mode (bool): Для SQLite на время загрузки включить
+                journal_mode=WAL и synchronous=OFF
+        """
+        with self.engine.connect() as connection, self._fast_mode(
+            connection, fast_mode
+        ):
+            try:
+                yield connection
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+
+    @contextmanager
+    def _fast_mode(self, connection, enabled):
+        """
+        Для SQLite на время загрузки journal_mode=WAL и synchronous=OFF.
+
+        После загрузки прежние режимы восстанавливаются. Выйти из WAL SQLite
+        позволяет только при единственном подключении к базе, иначе база
+        остается в WAL до следующей загрузки.
+        """
+        if not enabled or self.engine.dialect.name != "sqlite":
+            yield
+            return
+
+        synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        connection.exec_driver_sql("PRAGMA synchronous=OFF")
+        connection.commit()
         try:
-            for row_data in data_list:
-                session.execute(table.insert().values(**row_data))
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Error saving data: {e}")
+            yield
         finally:
-            session.close()
+            connection.exec_driver_sql(f"PRAGMA synchronous={synchronous}")
+            if journal_mode.lower() != "wal":
+                try:
+                    connection.exec_driver_sql(f"PRAGMA journal_mode={journal_mode}")
+                except OperationalError:
+                    pass
+            connection.commit()
+
+    # === Инкрементальная загрузка ====================================================
+
+    def upsert_data(
+        self,
+        table,
+        data_list,
+        key_columns=None,
+        delete_missing=False,
+        chunk_size=10_000,
+        fast_mode=False,
+    ):
+        """
+        Загрузить только новые и измененные строки.
+
+        Для каждой строки считается хэш ключа (по key_columns, по умолчанию по
+        всем столбцам) и хэш значений. Хэши пачки сверяются с _key_/_hash_ в
+        таблице одним индексным запросом, записываются только новые и
+        измененные строки через INSERT ... ON CONFLICT (_key_) DO UPDATE.
+        Повторная загрузка книги, где изменился 1% строк, пишет 1% строк.
+
+        Повторы ключа (например, одинаковые строки при ключе по всем
+        столбцам) не схлопываются: в ключ n-го повтора входит его номер,
+        поэтому a, b, b, c дает 4 строки и при повторной загрузке не
+        меняется. Для нумерации хранятся хэши всех ключей загрузки.
+
+        При ошибке транзакция откатывается и исключение пробрасывается.
+
+        Таблица должна быть создана с create_table(..., incremental=True).
+
+        Args:
+            table: Таблица
+            data_list: Итерируемый набор словарей
+            key_columns: Столбцы бизнес-ключа; без них измененная строка
+                считается новой, а старая - отсутствующей
+            delete_missing: Удалить строки, которых нет во входных данных
+            chunk_size (int): Количество строк в одной пачке
+            fast_mode (bool): Как в bulk_save_data
+
+        Returns:
+            dict: Количество новых, измененных, неизмененных и удаленных строк
+        """
+        if KEY_COLUMN not in table.c or HASH_COLUMN not in table.c:
+            raise ValueError(
+                f"Таблица {table.name} создана без столбцов {KEY_COLUMN}/{HASH_COLUMN}"
+            )
+        if chunk_size <= 0:
+            raise ValueError("Размер пачки должен быть больше нуля")
+
+        columns = self.get_column_names(table)
+        whole_row_key = key_columns is None
+        key_columns = columns if whole_row_key else list(key_columns)
+        converters = _get_converters(table)
+        statement = self._upsert(table, columns)
+
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        # Хэш ключа -> сколько раз он уже встретился в загрузке
+        occurrences = {}
+        seen = set()
+        start_time = time.perf_counter()
+
+        with self.engine.connect() as connection, self._fast_mode(
+            connection, fast_mode
+        ):
+            try:
+                rows = iter(data_list)
+                while chunk := list(islice(rows, chunk_size)):
+                    keyed = []
+                    for row in chunk:
+                        base_key = row_hash([row.get(col) for col in key_columns])
+                        number = occurrences.get(base_key, 0)
+                        occurrences[base_key] = number + 1
+                        key = base_key if number == 0 else row_hash([base_key, number])
+                        keyed.append((key, base_key, row))
+                    existing = self._fetch_hashes(
+                        connection, table, [key for key, _, _ in keyed]
+                    )
+
+                    changed = []
+                    for key, base_key, row in keyed:
+                        # Ключ по всей строке уже является хэшем значений
+                        if whole_row_key:
+                            values_hash = base_key
+                        else:
+                            values_hash = row_hash([row.get(col) for col in columns])
+                        old_hash = existing.get(key)
+                        if old_hash == values_hash:
+                            stats["unchanged"] += 1
+                            continue
+                        stats["updated" if old_hash is not None else "inserted"] += 1
+
+                        record = {col: row.get(col) for col in columns}
+                        record[KEY_COLUMN] = key
+                        record[HASH_COLUMN] = values_hash
+                        if converters:
+                            record = _convert_row(record, converters)
+                        changed.append(record)
+
+                    if changed:
+                        connection.execute(statement, changed)
+                    if delete_missing:
+                        seen.update(key for key, _, _ in keyed)
+
+                if delete_missing:
+                    stats["deleted"] = self._delete_missing(connection, table, seen)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 4)
+        return stats
 
-    def get_table_data(self, table):
-        session = self.Session()
+    def _upsert(self, table, columns, key_column=KEY_COLUMN, service_columns=True):
+        """INSERT, обновляющий строку с уже существующим key_column (_key_)"""
+        update_columns = [*columns, HASH_COLUMN] if service_columns else list(columns)
+        dialect = self.engine.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            module = sqlite if dialect == "sqlite" else postgresql
+            statement = module.insert(table)
+            return statement.on_conflict_do_update(
+                index_elements=[table.c[key_column]],
+                set_={col: statement.excluded[col] for col in update_columns},
+            )
+        if dialect in ("mysql", "mariadb"):
+            statement = mysql.insert(table)
+            return statement.on_duplicate_key_update(
+                {col: statement.inserted[col] for col in update_columns}
+            )
+        raise NotImplementedError(f"Upsert не поддерживается для {dialect}")
+
+    @staticmethod
+    def _fetch_hashes(connection, table, keys):
+        """Хэши значений для ключей пачки, _key_ -> _hash_"""
+        key_column = table.c[KEY_COLUMN]
+        hashes = {}
+        for start in range(0, len(keys), IN_CHUNK_SIZE):
+            query = select(key_column, table.c[HASH_COLUMN]).where(
+                key_column.in_(keys[start : start + IN_CHUNK_SIZE])
+            )
+            hashes.update(connection.execute(query).all())
+        return hashes
+
+    @staticmethod
+    def _delete_missing(connection, table, seen):
+        """Удалить строки, ключей которых не было во входных данных"""
+        key_column = table.c[KEY_COLUMN]
+        result = connection.execute(select(key_column))
+        missing = [key for (key,) in result if key not in seen]
+        for start in range(0, len(missing), IN_CHUNK_SIZE):
+            connection.execute(
+                table.delete().where(
+                    key_column.in_(missing[start : start + IN_CHUNK_SIZE])
+                )
+            )
+        return len(missing)
+
+    def _insert_ignore(self, table):
+        """INSERT, пропускающий строки с уже существующим первичным ключом"""
+        dialect = self.engine.dialect.name
+        if dialect == "sqlite":
+            return sqlite.insert(table).on_conflict_do_nothing()
+        if dialect == "postgresql":
+            return postgresql.insert(table).on_conflict_do_nothing()
+        return insert(table).prefix_with("IGNORE", dialect="mysql")
+
+    # === Индекс происхождения ========================================================
+
+    def create_lineage_tables(self):
+        """
+        Создать таблицы индекса происхождения (если их еще нет).
+
+        lineage_sources - ID источника -> файл, лист, строка;
+        lineage_aggregates - агрегированные значения отчетов;
+        lineage_edges - связи агрегат -> ID источника.
+        """
+        entry = self._entry
+        with entry.lock:
+            return self._create_lineage_tables(entry)
+
+    def _create_lineage_tables(self, entry):
+        if LINEAGE_SOURCES not in self.metadata.tables:
+            Table(
+                LINEAGE_SOURCES,
+                self.metadata,
+                Column("source_id", String, primary_key=True),
+                Column("file", String),
+                Column("sheet", String),
+                Column("row", Integer),
+                Index("ix_lineage_sources_location", "file", "sheet", "row"),
+            )
+            Table(
+                LINEAGE_AGGREGATES,
+                self.metadata,
+                Column("aggregate_id", String, primary_key=True),
+                Column("report", String, index=True),
+                Column("group_key", String),
+                Column("value", Float),
+            )
+            Table(
+                LINEAGE_EDGES,
+                self.metadata,
+                Column(
+                    "aggregate_id",
+                    String,
+                    ForeignKey(f"{LINEAGE_AGGREGATES}.aggregate_id"),
+                    primary_key=True,
+                ),
+                Column("source_id", String, primary_key=True),
+                Index("ix_lineage_edges_source", "source_id", "aggregate_id"),
+            )
+
+        tables = [
+            self.metadata.tables[name]
+            for name in (LINEAGE_SOURCES, LINEAGE_AGGREGATES, LINEAGE_EDGES)
+        ]
+        if LINEAGE_SOURCES not in entry.created:
+            self.metadata.create_all(self.engine, tables=tables)
+            entry.created.update(table.name for table in tables)
+        return tables
+
+    def save_lineage_sources(self, sources, chunk_size=10_000):
+        """
+        Записать расположение источников пакетно, существующие ID пропускаются.
+        При ошибке транзакция откатывается и исключение пробрасывается.
+
+        Args:
+            sources: Итерируемый набор словарей source_id, file, sheet, row
+        """
+        sources_table, _, _ = self.create_lineage_tables()
+        return self._bulk_execute(
+            self._insert_ignore(sources_table), sources, chunk_size, raise_errors=True
+        )
+
+    def save_lineage_aggregates(self, aggregates, chunk_size=10_000):
+        """
+        Записать агрегаты и их источники пакетно.
+
+        Пересчитанный агрегат заменяет прежний: значение обновляется, а его
+        связи удаляются и записываются заново в той же транзакции. При
+        ошибке транзакция откатывается и исключение пробрасывается.
+
+        Args:
+            aggregates: Итерируемый набор словарей aggregate_id, report,
+                group_key, value и source_ids (набор ID источников)
+
+        Returns:
+            dict: Количество агрегатов и связей, время и скорость (агрегатов/сек)
+        """
+        if chunk_size <= 0:
+            raise ValueError("Размер пачки должен быть больше нуля")
+
+        _, aggregates_table, edges_table = self.create_lineage_tables()
+        # Повторный агрегат с тем же ID заменяет предыдущий
+        aggregates = list(
+            {aggregate["aggregate_id"]: aggregate for aggregate in aggregates}.values()
+        )
+        update_columns = ("report", "group_key", "value")
+        statement = self._upsert(
+            aggregates_table, update_columns, "aggregate_id", service_columns=False
+        )
+        aggregate_id = edges_table.c.aggregate_id
+
+        saved_rows = 0
+        saved_edges = 0
+        start_time = time.perf_counter()
+        with self.engine.begin() as connection:
+            for start in range(0, len(aggregates), chunk_size):
+                chunk = aggregates[start : start + chunk_size]
+                ids = [aggregate["aggregate_id"] for aggregate in chunk]
+                rows = [
+                    {key: aggregate.get(key) for key in ("aggregate_id", *update_columns)}
+                    for aggregate in chunk
+                ]
+                edges = [
+                    {"aggregate_id": aggregate["aggregate_id"], "source_id": source_id}
+                    for aggregate in chunk
+                    for source_id in dict.fromkeys(aggregate.get("source_ids", ()))
+                ]
+                connection.execute(statement, rows)
+                for id_start in range(0, len(ids), IN_CHUNK_SIZE):
+                    connection.execute(
+                        edges_table.delete().where(
+                            aggregate_id.in_(ids[id_start : id_start + IN_CHUNK_SIZE])
+                        )
+                    )
+                if edges:
+                    connection.execute(edges_table.insert(), edges)
+                saved_rows += len(rows)
+                saved_edges += len(edges)
+
+        total_time = time.perf_counter() - start_time
+        return {
+            "rows": saved_rows,
+            "edges": saved_edges,
+            "seconds": round(total_time, 4),
+            "rows_per_second": round(saved_rows / total_time, 1) if total_time else 0.0,
+        }
+
+    def get_aggregate_sources(self, aggregate_id):
+        """Строки-источники, из которых получен агрегат (по индексу связей)"""
+        sources_table, _, edges_table = self.create_lineage_tables()
+        query = (
+            select(sources_table)
+            .join(edges_table, edges_table.c.source_id == sources_table.c.source_id)
+            .where(edges_table.c.aggregate_id == aggregate_id)
+            .order_by(sources_table.c.file, sources_table.c.sheet, sources_table.c.row)
+        )
+        with self.engine.connect() as connection:
+            return [dict(row._mapping) for row in connection.execute(query)]
+
+    def get_source_aggregates(self, source_id=None, file=None, sheet=None, row=None):
+        """
+        Агрегаты, затронутые строкой-источником.
+
+        Строка задается ID источника либо расположением file/sheet/row.
+        """
+        sources_table, aggregates_table, edges_table = self.create_lineage_tables()
+        query = select(aggregates_table).join(
+            edges_table, edges_table.c.aggregate_id == aggregates_table.c.aggregate_id
+        )
+        if source_id is not None:
+            query = query.where(edges_table.c.source_id == source_id)
+        else:
+            query = query.join(
+                sources_table, sources_table.c.source_id == edges_table.c.source_id
+            ).where(
+                sources_table.c.file == file,
+                sources_table.c.sheet == sheet,
+                sources_table.c.row == row,
+            )
+        with self.engine.connect() as connection:
+            return [dict(item._mapping) for item in connection.execute(query.distinct())]
+
+    def get_table_data(self, table, columns=None, where=None):
+        """Все строки таблицы списком словарей без первичного ключа"""
+        return list(self.iter_table_data(table, columns, where))
+
+    def iter_table_data(self, table, columns=None, where=None, batch_size=10_000):
+        """Потоково отдает строки таблицы словарями"""
+        names = self.get_column_names(table, columns)
+        for batch in self.iter_table_batches(table, names, where, batch_size):
+            for row in batch:
+                yield dict(zip(names, row))
+
+    def iter_table_batches(
+        self,
+        table,
+        columns=None,
+        where=None,
+        batch_size=10_000,
+        after_id=None,
+        with_id=False,
+    ):
+        """
+        Потоковое чтение таблицы пачками кортежей с постоянной памятью.
+
+        Таблицы с первичным ключом _id_ читаются постранично по ключу
+        (WHERE _id_ > последний ORDER BY _id_ LIMIT batch_size), поэтому каждая
+        страница - короткий запрос по индексу без OFFSET. Для прочих таблиц
+        используется потоковый курсор (stream_results / yield_per).
+
+        Args:
+            table: Таблица
+            columns: Имена столбцов, по умолчанию все кроме _id_
+            where: Словарь столбец -> значение (список значений - IN, None -
+                IS NULL) или список выражений SQLAlchemy
+            batch_size: Количество строк в пачке
+            after_id: Продолжить чтение после этого значения _id_
+            with_id: Добавлять _id_ первым элементом каждой строки
+        """
+        names = self.get_column_names(table, columns)
+        selected = [table.c[name] for name in names]
+        conditions = self._where_clauses(table, where)
+        id_column = table.c.get(ID_COLUMN)
+
+        with self.engine.connect() as connection:
+            if id_column is None:
+                query = select(*selected).where(*conditions)
+                result = connection.execution_options(
+                    stream_results=True, yield_per=batch_size
+                ).execute(query)
+                for partition in result.partitions():
+                    yield [tuple(row) for row in partition]
+                return
+
+            last_id = after_id
+            while True:
+                query = select(id_column, *selected).where(*conditions)
+                if last_id is not None:
+                    query = query.where(id_column > last_id)
+                query = query.order_by(id_column).limit(batch_size)
+                rows = connection.execute(query).all()
+                if not rows:
+                    return
+
+                last_id = rows[-1][0]
+                yield [tuple(row) if with_id else tuple(row[1:]) for row in rows]
+                if len(rows) < batch_size:
+                    return
+
+    @staticmethod
+    def get_column_names(table, columns=None):
+        """Имена столбцов для чтения, по умолчанию все кроме первичного ключа"""
+        if columns is None:
+            return [
+                column.name
+                for column in table.columns
+                if column.name not in SERVICE_COLUMNS
+            ]
+        unknown = [name for name in columns if name not in table.c]
+        if unknown:
+            raise ValueError(f"Столбцы {unknown} не найдены в таблице {table.name}")
+        return list(columns)
+
+    @staticmethod
+    def _where_clauses(table, where):
+        """Условия отбора из словаря или готовых выражений"""
+        if where is None:
+            return []
+        if not isinstance(where, dict):
+            return list(where)
+
+        clauses = []
+        for name, value in where.items():
+            column = table.c[name]
+            if value is None:
+                clauses.append(column.is_(None))
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                clauses.append(column.in_(value))
+            else:
+                clauses.append(column == value)
+        return clauses
+
+
+def row_hash(values):
+    """
+    Стабильный 64-битный хэш набора значений (blake2b), одинаковый между
+    запусками. None отличается от пустой строки.
+    """
+    text = "\x1f".join(
+        ["\x00" if value is None else str(value) for value in values]
+    )
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def infer_column_types(sample, columns, sample_size=1_000):
+    """
+    Вывести типы столбцов по образцу данных.
+
+    Значения могут быть строками (как после CalamineLoaderExcel.get_data):
+    "12" - int, "1.5" - float, "2024-01-31" - date, "2024-01-31 10:00:00" -
+    datetime. Числа с ведущими нулями ("007") - text, чтобы не потерять
+    нули кодов. Пустые значения пропускаются, int расширяется до float,
+    date - до datetime, остальные сочетания дают text.
+
+    Returns:
+        dict: Имя столбца -> тип из COLUMN_TYPES
+    """
+    found = {col_name: set() for col_name in columns}
+    for row in islice(sample, sample_size):
+        for col_name, kinds in found.items():
+            value = row.get(col_name)
+            if value is not None and value != "":
+                kinds.add(_infer_value_type(value))
+
+    types = {}
+    for col_name, kinds in found.items():
+        if kinds <= {"int"} and kinds:
+            types[col_name] = "int"
+        elif kinds <= {"int", "float"} and kinds:
+            types[col_name] = "float"
+        elif kinds <= {"date"} and kinds:
+            types[col_name] = "date"
+        elif kinds <= {"date", "datetime"} and kinds:
+            types[col_name] = "datetime"
+        else:
+            types[col_name] = "text"
+    return types
+
+
+def _infer_value_type(value):
+    if isinstance(value, bool):
+        return "text"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime.datetime):
+        return "datetime"
+    if isinstance(value, datetime.date):
+        return "date"
+
+    text = str(value).strip()
+    if has_leading_zeros(text):
+        return "text"
+    for kind, parse in (("int", int), ("float", float)):
         try:
-            result = session.query(table).all()
-            return [{column.name: getattr(row, column.name) for column in table.columns if column.name != 'id'} for row in result]
-        finally:
-            session.close()
+            parse(text)
+            return kind
+        except ValueError:
+            pass
+    # Только ISO формат с разделителями, чтобы "20240131" не стал датой
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            datetime.date.fromisoformat(text)
+            return "date"
+        except ValueError:
+            return "text"
+    if len(text) > 10 and text[4] == "-" and text[10] in " T":
+        try:
+            datetime.datetime.fromisoformat(text)
+            return "datetime"
+        except ValueError:
+            return "text"
+    return "text"
+
+
+def _to_int(value):
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value} не целое число")
+    return int(number)
+
+
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return datetime.datetime.fromisoformat(str(value).strip())
+
+
+_CONVERTERS = {
+    Integer: (int, _to_int),
+    Float: (float, float),
+    Date: (datetime.date, _to_date),
+    DateTime: (datetime.datetime, _to_datetime),
+}
+
+
+def _get_converters(table):
+    """Преобразователи значений для типизированных столбцов таблицы"""
+    converters = []
+    for column in table.columns:
+        if column.primary_key:
+            continue
+        # isinstance, чтобы учитывать и отраженные типы (INTEGER, DATE, ...)
+        for sql_type, converter in _CONVERTERS.items():
+            if isinstance(column.type, sql_type):
+                converters.append((column.name, *converter))
+                break
+    return converters
+
+
+def _convert_row(row, converters):
+    """
+    Привести значения строки к типам столбцов, пустые - None.
+
+    Raises:
+        ValueError: Значение не приводится к типу столбца
+    """
+    row = dict(row)
+    for col_name, target_type, convert in converters:
+        value = row.get(col_name)
+        if value is None:
+            continue
+        if isinstance(value, target_type) and not isinstance(value, bool):
+            continue
+        if value == "":
+            row[col_name] = None
+            continue
+        try:
+            row[col_name] = convert(value)
+        except (TypeError, ValueError) as error:
+            raise ValueError(
+                f"Значение {value!r} столбца {col_name} не приводится к типу "
+                f"{target_type.__name__}"
+            ) from error
+    return row
+
+
+def _bulk_stats(saved_rows, start_time):
+    """Количество записанных строк, время и скорость пакетной записи"""
+    total_time = time.perf_counter() - start_time
+    return {
+        "rows": saved_rows,
+        "seconds": round(total_time, 4),
+        "rows_per_second": round(saved_rows / total_time, 1) if total_time else 0.0,
+    }
 
 
 # Пример использования
@@ -0,0 +1,273 @@
+"""
+Бенчмарк сохранения и загрузки данных в форматах из core_test.
+
+Генерирует синтетический лист заданного размера и состава, прогоняет каждую
+пару сохранение/загрузка несколько раз и выводит JSON со временем, пиковой
+памятью, размером файла и скоростью в строках в секунду.
+
+Пример:
+    python -m core_1.benchmark --rows 100000 --columns 40 --repeat 5 -o bench.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from core_1 import core_test
+from core_1.BD.model import DynamicTableManager, dispose_engines
+from get_dat.CalamineLoaderExcel import CalamineLoaderExcel
+
+
+def generate_sheet(
+    rows: int,
+    columns: int,
+    text_ratio: float = 0.5,
+    cardinality: int = 1_000,
+    seed: int = 0,
+    as_str: bool = True,
+) -> list[list]:
+    """
+    Сгенерировать лист: первая строка - заголовки, далее данные.
+
+    Args:
+        rows (int): Количество строк данных
+        columns (int): Количество столбцов
+        text_ratio (float): Доля текстовых столбцов, остальные - числовые
+        cardinality (int): Количество различных значений в текстовом столбце
+        seed (int): Зерно генератора для воспроизводимости
+        as_str (bool): Все значения строками, как после CalamineLoaderExcel.get_data
+    """
+    rnd = random.Random(seed)
+    text_columns = round(columns * text_ratio)
+    headers = [
+        f"text_{col} / Текст" if col < text_columns else f"num_{col} / Число"
+        for col in range(columns)
+    ]
+    vocabulary = [f"значение_{value}" for value in range(max(cardinality, 1))]
+
+    data = [headers]
+    for _ in range(rows):
+        row = [rnd.choice(vocabulary) for _ in range(text_columns)]
+        row.extend(round(rnd.uniform(0, 1e6), 2) for _ in range(columns - text_columns))
+        data.append([str(value) for value in row] if as_str else row)
+    return data
+
+
+# Файл БД -> таблица, созданная при сохранении
+_sqlite_tables = {}
+
+
+def _save_sqlite(data, filename):
+    manager = DynamicTableManager(f"sqlite:///{filename}")
+    table = manager.create_table(f"bench_{len(_sqlite_tables)}", data.headers)
+    manager.bulk_save_data(table, data.iter_dicts(), fast_mode=True)
+    _sqlite_tables[filename] = table
+
+
+def _load_sqlite(filename):
+    db_url = f"sqlite:///{filename}"
+    manager = DynamicTableManager(db_url)
+    data = manager.get_table_data(_sqlite_tables[filename])
+    # Закрываем соединения, чтобы файл можно было удалить
+    dispose_engines(db_url)
+    return data
+
+
+def _load_xlsx(filename):
+    cal_manager = CalamineLoaderExcel(filename)
+    return cal_manager.get_data(cal_manager.get_sheet_by_index(0))
+
+
+def _unwrap(func):
+    """Функция без декоратора execution_time, чтобы print не влиял на замеры"""
+    return getattr(func, "__wrapped__", func)
+
+
+# Формат -> (расширение файла, сохранение, загрузка)
+FORMATS = {
+    "sqlite": (".db", _save_sqlite, _load_sqlite),
+    "xlsx": (".xlsx", _unwrap(core_test.save_data_to_excel_fast), _load_xlsx),
+    "xmlz": (
+        ".xmlz",
+        _unwrap(core_test.save_data_to_compressed_xml),
+        _unwrap(core_test.read_compressed_xml),
+    ),
+    "msgpack": (
+        ".msgpack",
+        _unwrap(core_test.save_data_fast),
+        _unwrap(core_test.read_data_fast),
+    ),
+    "msgpack_gzip": (
+        ".msgpack.gz",
+        _unwrap(core_test.save_compressed_msgpack),
+        _unwrap(core_test.load_compressed_msgpack),
+    ),
+    "msgpack_lz4": (
+        ".msgpack.lz4",
+        _unwrap(core_test.save_lz4_msgpack),
+        _unwrap(core_test.load_lz4_msgpack),
+    ),
+    "msgpack_chunked": (
+        ".msgpack.chunked",
+        _unwrap(core_test.save_chunked_msgpack),
+        _unwrap(core_test.load_chunked_msgpack),
+    ),
+}
+
+
+def _file_size(filename: str) -> int:
+    """Размер файла вместе с журналами SQLite, если они есть"""
+    return sum(
+        os.path.getsize(path)
+        for path in (filename, f"{filename}-wal", f"{filename}-journal")
+        if os.path.exists(path)
+    )
+
+
+def _remove(filename: str) -> None:
+    for path in (filename, f"{filename}-wal", f"{filename}-shm", f"{filename}-journal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _measure(func, *args) -> float:
+    """Время выполнения функции в секундах"""
+    gc.collect()
+    start_time = time.perf_counter()
+    func(*args)
+    wall_time = time.perf_counter() - start_time
+    return wall_time
+
+
+def _peak_memory(func, *args) -> int:
+    """Пиковая память функции, отдельным прогоном, чтобы не искажать время"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _summary(times: list[float], rows: int) -> dict:
+    median = statistics.median(times)
+    return {
+        "wall_s_min": round(min(times), 6),
+        "wall_s_median": round(median, 6),
+        "wall_s_mean": round(statistics.fmean(times), 6),
+        "rows_per_s": round(rows / median, 1) if median else None,
+    }
+
+
+def run_benchmark(
+    rows: int = 10_000,
+    columns: int = 20,
+    text_ratio: float = 0.5,
+    cardinality: int = 1_000,
+    repeat: int = 3,
+    formats: list[str] | None = None,
+    workdir: str | None = None,
+    seed: int = 0,
+    measure_memory: bool = True,
+) -> dict:
+    """
+    Прогнать сохранение и загрузку для каждого формата.
+
+    Returns:
+        dict: Параметры запуска и результаты по форматам
+    """
+    formats = formats or list(FORMATS)
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Неизвестные форматы: {', '.join(sorted(unknown))}")
+
+    sheet = generate_sheet(rows, columns, text_ratio, cardinality, seed)
+    data = core_test.TableData.from_rows(sheet)
+    del sheet
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir:
+        for name in formats:
+            suffix, save, load = FORMATS[name]
+            save_times, load_times = [], []
+            size = 0
+            for run in range(repeat):
+                filename = os.path.join(tmp_dir, f"{name}_{run}{suffix}")
+                save_times.append(_measure(save, data, filename))
+                size = _file_size(filename)
+                load_times.append(_measure(load, filename))
+                _remove(filename)
+
+            result = {
+                "format": name,
+                "bytes_on_disk": size,
+                "save": _summary(save_times, rows),
+                "load": _summary(load_times, rows),
+            }
+            if measure_memory:
+                filename = os.path.join(tmp_dir, f"{name}_memory{suffix}")
+                result["save"]["peak_bytes"] = _peak_memory(save, data, filename)
+                result["load"]["peak_bytes"] = _peak_memory(load, filename)
+                _remove(filename)
+            results.append(result)
+
+    return {
+        "params": {
+            "rows": rows,
+            "columns": columns,
+            "text_ratio": text_ratio,
+            "cardinality": cardinality,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--text-ratio", type=float, default=0.5)
+    parser.add_argument("--cardinality", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS))
+    parser.add_argument("--workdir", help="Каталог для временных файлов")
+    parser.add_argument("--no-memory", action="store_true", help="Не замерять память")
+    parser.add_argument("-o", "--output", help="Файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        rows=args.rows,
+        columns=args.columns,
+        text_ratio=args.text_ratio,
+        cardinality=args.cardinality,
+        repeat=args.repeat,
+        formats=args.formats,
+        workdir=args.workdir,
+        seed=args.seed,
+        measure_memory=not args.no_memory,
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
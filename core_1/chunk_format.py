@@ -0,0 +1,195 @@
+"""
+Блочный формат msgpack + lz4 с произвольным доступом.
+
+Структура файла:
+    MAGIC
+    uint32 длина заголовка + msgpack {"version", "columns"}
+    блоки строк: каждый - отдельный lz4 кадр с msgpack списком строк
+    msgpack индекс блоков [[смещение, длина, первая строка, количество строк], ...]
+    трейлер: uint64 смещение индекса, uint32 длина индекса, MAGIC
+
+Блоки сжимаются независимо, поэтому читатель может распаковывать их по одному
+или сразу перейти к нужной строке по индексу, не читая остальной файл.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+
+import lz4.frame
+import msgpack
+
+from typing import Any, Iterable, Iterator, Sequence
+
+MAGIC = b"MPLZ4C01"
+VERSION = 1
+_LENGTH = struct.Struct("<I")
+_TRAILER = struct.Struct(f"<QI{len(MAGIC)}s")
+
+
+class ChunkedWriter:
+    """Потоковая запись строк в блочный файл"""
+
+    def __init__(
+        self, filename: str, columns: Sequence[str], rows_per_block: int = 10_000
+    ):
+        if rows_per_block <= 0:
+            raise ValueError("Количество строк в блоке должно быть больше нуля")
+
+        self.filename = filename
+        self.columns = list(columns)
+        self.rows_per_block = rows_per_block
+        self.rows = 0
+        self._blocks = []
+        self._buffer = []
+        self._file = open(filename, "wb")
+
+        header = msgpack.packb({"version": VERSION, "columns": self.columns})
+        self._file.write(MAGIC)
+        self._file.write(_LENGTH.pack(len(header)))
+        self._file.write(header)
+
+    def write_row(self, row: Sequence[Any]) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= self.rows_per_block:
+            self._flush_block()
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        for row in rows:
+            self.write_row(row)
+
+    def close(self) -> None:
+        """Дописать последний блок, индекс и трейлер"""
+        if self._file.closed:
+            return
+        self._flush_block()
+        index = msgpack.packb(self._blocks)
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(_TRAILER.pack(index_offset, len(index), MAGIC))
+        self._file.close()
+
+    def abort(self) -> None:
+        """Прервать запись: закрыть и удалить недописанный файл"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def _flush_block(self) -> None:
+        if not self._buffer:
+            return
+        block = lz4.frame.compress(msgpack.packb(self._buffer))
+        self._blocks.append([self._file.tell(), len(block), self.rows, len(self._buffer)])
+        self._file.write(block)
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def __enter__(self) -> "ChunkedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # При ошибке индекс не пишется: частичный файл не должен выглядеть целым
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class ChunkedReader:
+    """Чтение блочного файла через mmap: ленивый обход блоков и доступ к строке N"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Файл {filename} пуст или поврежден")
+
+        if self._mmap[: len(MAGIC)] != MAGIC or len(self._mmap) < _TRAILER.size:
+            self.close()
+            raise ValueError(f"Файл {filename} не является блочным msgpack файлом")
+
+        index_offset, index_length, magic = _TRAILER.unpack_from(
+            self._mmap, len(self._mmap) - _TRAILER.size
+        )
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Файл {filename} не дописан или поврежден")
+
+        (header_length,) = _LENGTH.unpack_from(self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + _LENGTH.size
+        header = msgpack.unpackb(self._mmap[header_start : header_start + header_length])
+        self.columns = header["columns"]
+
+        self.blocks = msgpack.unpackb(
+            self._mmap[index_offset : index_offset + index_length]
+        )
+        self._first_rows = [block[2] for block in self.blocks]
+        self._cached_block = (None, None)
+
+    def __len__(self) -> int:
+        if not self.blocks:
+            return 0
+        _, _, first_row, row_count = self.blocks[-1]
+        return first_row + row_count
+
+    def read_block(self, number: int) -> list[tuple]:
+        """Распаковать блок по номеру (последний прочитанный блок кэшируется)"""
+        cached_number, cached_rows = self._cached_block
+        if cached_number == number:
+            return cached_rows
+
+        offset, length, _, _ = self.blocks[number]
+        rows = msgpack.unpackb(
+            lz4.frame.decompress(self._mmap[offset : offset + length]), use_list=False
+        )
+        self._cached_block = (number, rows)
+        return rows
+
+    def iter_blocks(self) -> Iterator[list[tuple]]:
+        for number in range(len(self.blocks)):
+            yield self.read_block(number)
+
+    def iter_rows(self) -> Iterator[tuple]:
+        for rows in self.iter_blocks():
+            yield from rows
+
+    def get_row(self, position: int) -> tuple:
+        """Получить строку по номеру, распаковав только содержащий ее блок"""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Строка {position} вне диапазона")
+
+        number = bisect.bisect_right(self._first_rows, position) - 1
+        return self.read_block(number)[position - self._first_rows[number]]
+
+    def read_rows(self, start: int, stop: int) -> list[tuple]:
+        """Получить строки в диапазоне [start, stop), распаковав только нужные блоки"""
+        start, stop = max(start, 0), min(stop, len(self))
+        result = []
+        if start >= stop:
+            return result
+
+        number = bisect.bisect_right(self._first_rows, start) - 1
+        while number < len(self.blocks) and self._first_rows[number] < stop:
+            first_row = self._first_rows[number]
+            rows = self.read_block(number)
+            result.extend(rows[max(start - first_row, 0) : stop - first_row])
+            number += 1
+        return result
+
+    def close(self) -> None:
+        if hasattr(self, "_mmap"):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "ChunkedReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
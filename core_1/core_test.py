@@ -1,13 +1,27 @@
-import xlsxwriter
 import zipfile
-import io
 import msgpack
 import gzip
 import lz4.frame
+import pandas as pd
 
+from itertools import chain, islice
+from typing import Iterable, Iterator
 from lxml import etree
 from core_1.BD.model import DynamicTableManager
+from core_1.chunk_format import ChunkedReader, ChunkedWriter
 from core_1.dop_function import execution_time
+from core_1.profiling import PROFILER
+from core_1.table_data import (
+    TableData,
+    get_headers,
+    iter_row_items,
+    normalize_headers,
+    project_row,
+)
+from core_1.pipeline import Pipeline
+from core_1.sinks import ChunkedSink, DatabaseSink, MsgpackSink, XlsxSink, XmlzSink
+from get_dat.CSVData import DataCollector
+from get_dat.CacheExcel import ExcelParseCache
 from get_dat.CalamineLoaderExcel import CalamineLoaderExcel
 
 
@@ -22,12 +36,21 @@ def main():
     file_save_name_msgpack = "output.msgpack"
     file_save_name_msgpackZ = "output_zip.msgpack"
     file_save_name_lz4 = "output_lz4.msgpack"
+    file_save_name_chunked = "output_chunked.msgpack"
+    cache_dir = "parse_cache"
+    file_profile = "profile.json"
+    file_trace = "profile_trace.json"
 
-    # Получаем данные из файла
-    common_data = get_data_from_excel(path_file, sheet_number)
+    # Профилирование этапов (с пиковой памятью)
+    PROFILER.enable(trace_memory=True)
 
-    # Конвертируем данные в словарь
-    dict_data = converter_data_in_dict(common_data)
+    # Получаем данные из файла (повторные запуски читают лист из кэша)
+    common_data = get_data_from_excel(
+        path_file, sheet_number, ExcelParseCache(cache_dir)
+    )
+
+    # Конвертируем данные в компактную таблицу
+    dict_data = converter_data_in_table(common_data)
 
     # === БД ===========================================================================
     # Заполняем БД данными
@@ -71,12 +94,55 @@ def main():
     # Получение данные в msgpack
     data_3 = load_lz4_msgpack(file_save_name_lz4)
 
+    # === msgpack lz4 блочный ===========================================================================
+    print('=== msgpack lz4 блочный ====================')
+    # Сохраняем данные в блочный файл
+    save_chunked_msgpack(dict_data, file_save_name_chunked)
+
+    # Получение данные из блочного файла
+    data_4 = load_chunked_msgpack(file_save_name_chunked)
+
+    # === Конвейер ===========================================================================
+    print('=== Конвейер ====================')
+    # Один проход по листу пачками с записью во все форматы параллельно
+    stats = Pipeline(
+        iter_data_from_excel(path_file, sheet_number),
+        {
+            "db": DatabaseSink(db_url, "people_pipeline"),
+            "xlsx": XlsxSink(f"pipeline_{file_save_name_xlsx}"),
+            "xmlz": XmlzSink(f"pipeline_{file_save_name_xmlz}"),
+            "msgpack": MsgpackSink(f"pipeline_{file_save_name_msgpack}"),
+            "msgpack_gzip": MsgpackSink(f"pipeline_{file_save_name_msgpackZ}", "gzip"),
+            "msgpack_lz4": MsgpackSink(f"pipeline_{file_save_name_lz4}", "lz4"),
+            "chunked": ChunkedSink(f"pipeline_{file_save_name_chunked}"),
+        },
+    ).run()
+    for name, sink_stats in stats["sinks"].items():
+        print(f"{name}: {sink_stats['rows']} строк за {sink_stats['seconds']:.3f} сек.")
+
+    # Сохраняем отчет профилировщика
+    PROFILER.disable()
+    PROFILER.export_json(file_profile)
+    PROFILER.export_chrome_trace(file_trace)
+
+    # Время этапов (при включенном профилировщике execution_time не печатает
+    # его на каждом вызове)
+    for name, span_stats in PROFILER.summary().items():
+        print(f"Время выполнения `{name}` - {span_stats['total_ms'] / 1000:.4f} сек.")
+
     pass
 
 
 @execution_time
-def get_data_from_excel(path_file: str, sheet_number: int) -> list[list[str]]:
-    """Получаем данные из указанного файла"""
+def get_data_from_excel(
+    path_file: str, sheet_number: int, cache: ExcelParseCache | None = None
+) -> list[list[str]]:
+    """Получаем данные из указанного файла (при наличии кэша - из кэша)"""
+    if cache is not None:
+        data = cache.get_sheet_data(path_file, sheet_number)
+        PROFILER.count(rows=len(data))
+        return data
+
     cal_manager = CalamineLoaderExcel(path_file)
 
     # Проверяем указанный лист
@@ -89,100 +155,235 @@ def get_data_from_excel(path_file: str, sheet_number: int) -> list[list[str]]:
 
     # Получаем данные из листа
     data = cal_manager.get_data(sheet)
+    PROFILER.count(rows=len(data))
     return data
 
 
 @execution_time
-def converter_data_in_dict(data: list[list[str]]) -> list[dict[str, str]]:
-    """Конвертируем данные в словарь"""
-    headers = data[0]
-    headers = [header.split(" / ")[0] for header in headers]
-    data = data[1:]
-    result = []
-    for row in data:
-        result.append(dict(zip(headers, row)))
-    return result
+def get_typed_data_from_excel(
+    path_file: str, sheet_number: int, dtypes: dict[str, str] | None = None
+) -> pd.DataFrame:
+    """Получаем типизированные столбцы из указанного файла"""
+    cal_manager = CalamineLoaderExcel(path_file)
 
+    # Проверяем указанный лист
+    count_sheets = cal_manager.get_sheet_names()
+    if sheet_number >= len(count_sheets):
+        raise ValueError(f"Лист с номером {sheet_number} не найден")
 
-@execution_time
-def filling_DB_with_data(
-    db_url: str, table_name: str, data: list[dict[str, str]]
-) -> None:
-    """Заполняем БД данными"""
-    # Подключаем БД
-    manager = DynamicTableManager(db_url)
+    # Получаем указанный лист
+    sheet = cal_manager.get_sheet_by_index(sheet_number)
+
+    # Получаем столбцы с сохранением типов
+    return cal_manager.get_typed_data(sheet, dtypes)
+
+
+def iter_data_from_excel(
+    path_file: str, sheet_number: int, batch_size: int = 10_000
+) -> Iterator[list[list[str]]]:
+    """Потоково получаем данные из указанного файла пачками строк"""
+    cal_manager = CalamineLoaderExcel(path_file)
+
+    # Проверяем указанный лист
+    count_sheets = cal_manager.get_sheet_names()
+    if sheet_number >= len(count_sheets):
+        raise ValueError(f"Лист с номером {sheet_number} не найден")
+
+    # Получаем указанный лист
+    sheet = cal_manager.get_sheet_by_index(sheet_number)
+
+    # Отдаем данные пачками, ссылка на cal_manager держит книгу открытой
+    yield from cal_manager.iter_batches(sheet, batch_size, as_str=True)
 
-    # Создание таблицы
-    columns = list(data[0].keys())
-    people_table = manager.create_table(table_name, columns)
 
-    # Сохранение данных
-    manager.save_data(people_table, data)
+def iter_data_from_csv(
+    path_file: str, batch_size: int = 10_000
+) -> Iterator[list[list[str]]]:
+    """Потоково получаем данные из CSV файла пачками строк, как из листа Excel"""
+    yield from DataCollector(path_file).iter_batches(batch_size)
 
 
 @execution_time
-def save_data_to_excel_fast(data, filename):
-    workbook = xlsxwriter.Workbook(filename)
-    worksheet = workbook.add_worksheet()
+def converter_data_in_dict(data: Iterable[list[str]]) -> list[dict[str, str]]:
+    """Конвертируем данные в словарь"""
+    return list(iter_dict_data(data))
+
 
-    # Записываем заголовки
-    headers = list(data[0].keys())
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header)
+@execution_time
+def converter_data_in_table(data: Iterable[list[str]]) -> TableData:
+    """Конвертируем данные в компактную таблицу с общими заголовками"""
+    return TableData.from_rows(data)
 
-    # Записываем данные
-    for row, record in enumerate(data, start=1):
-        for col, value in enumerate(record.values()):
-            worksheet.write(row, col, value)
 
-    workbook.close()
+def iter_dict_data(data: Iterable[list[str]]) -> Iterator[dict[str, str]]:
+    """Потоково конвертируем строки в словари, первая строка - заголовки"""
+    rows = iter(data)
+    raw_headers = next(rows, None)
+    if raw_headers is None:
+        return
+    headers, positions = normalize_headers(raw_headers)
+    for row in rows:
+        yield dict(zip(headers, project_row(row, positions)))
 
 
 @execution_time
-def save_data_to_compressed_xml(data, filename):
-    root = etree.Element("data")
+def filling_DB_with_data(
+    db_url: str,
+    table_name: str,
+    data: TableData | list[dict[str, str]],
+    chunk_size: int = 10_000,
+    fast_mode: bool = True,
+    column_types: dict[str, str] | None = None,
+    indexes: Iterable[str | tuple[str, ...]] = (),
+    incremental: bool = False,
+    key_columns: list[str] | None = None,
+    delete_missing: bool = False,
+    infer_types: bool = False,
+) -> None:
+    """
+    Заполняем БД данными.
+
+    По умолчанию все столбцы - строки. Типы задаются в column_types, а при
+    infer_types остальные выводятся по первым 1 000 строкам; значение, не
+    приводимое к типу столбца, прерывает загрузку с откатом.
 
-    for row in data:
-        row_elem = etree.SubElement(root, "row")
-        for key, value in row.items():
-            cell = etree.SubElement(row_elem, "cell")
-            cell.set("name", key)
-            cell.text = str(value)
+    При incremental повторная загрузка книги записывает только новые и
+    измененные строки (по хэшу строки или бизнес-ключа key_columns), а при
+    delete_missing удаляет строки, которых больше нет в книге.
+    """
+    # Подключаем БД
+    manager = DynamicTableManager(db_url)
 
-    tree = etree.ElementTree(root)
+    # Создание таблицы с типизированными столбцами
+    columns = get_headers(data)
+    sample = None
+    if infer_types:
+        rows = data.iter_dicts() if isinstance(data, TableData) else data
+        sample = list(islice(rows, 1_000))
+    people_table = manager.create_table(
+        table_name, columns, column_types, sample, indexes, incremental
+    )
+
+    rows = data.iter_dicts() if isinstance(data, TableData) else data
+    if incremental:
+        # Загружаем только изменения
+        stats = manager.upsert_data(
+            people_table,
+            rows,
+            key_columns,
+            delete_missing,
+            chunk_size=chunk_size,
+            fast_mode=fast_mode,
+        )
+        manager.create_indexes(people_table)
+        PROFILER.count(rows=stats["inserted"] + stats["updated"])
+        print(
+            f"Новых строк: {stats['inserted']}, измененных: {stats['updated']}, "
+            f"без изменений: {stats['unchanged']}, удалено: {stats['deleted']} "
+            f"за {stats['seconds']} сек."
+        )
+        return
+
+    # Сохранение данных пачками
+    stats = manager.bulk_save_data(
+        people_table,
+        rows,
+        chunk_size=chunk_size,
+        fast_mode=fast_mode,
+        raise_errors=True,
+    )
+
+    # Индексы строим после загрузки
+    manager.create_indexes(people_table)
+    PROFILER.count(rows=stats["rows"])
+    print(
+        f"Записано строк: {stats['rows']} за {stats['seconds']} сек. "
+        f"({stats['rows_per_second']} строк/сек)"
+    )
 
-    # Создаем сжатый файл
-    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
-        # Записываем XML в память
-        xml_data = io.BytesIO()
-        tree.write(xml_data, xml_declaration=True, encoding="utf-8", pretty_print=True)
-        xml_data.seek(0)
 
-        # Добавляем XML в архив
-        zf.writestr("data.xml", xml_data.getvalue())
+@execution_time
+def save_data_to_excel_fast(data, filename, column_types=None, sheet_name=None):
+    """
+    Записываем данные в xlsx построчно в режиме constant_memory.
+
+    data - TableData, список или итератор словарей. Типы столбцов
+    ("number", "date", "string") задаются в column_types или определяются
+    по первому непустому значению столбца; ячейки пишутся типизированными
+    методами без проверки каждого значения. Если строк больше, чем
+    помещается на лист Excel, данные продолжаются на следующих листах.
+    """
+    headers, rows = iter_headers_and_values(data)
+    sink = XlsxSink(filename, column_types, sheet_name)
+    sink.open(headers)
+    sink.write(rows)
+    sink.close()
+
+
+def iter_headers_and_values(data) -> tuple[list[str], Iterable]:
+    """Заголовки и значения строк для TableData, списка или итератора словарей"""
+    if isinstance(data, TableData):
+        return data.headers, data.rows
+
+    records = iter(data)
+    first_record = next(records, None)
+    if first_record is None:
+        return [], []
+    headers = list(first_record.keys())
+    return headers, (
+        [record.get(key) for key in headers]
+        for record in chain([first_record], records)
+    )
+
+
+@execution_time
+def save_data_to_compressed_xml(data, filename):
+    # Пишем XML потоково прямо в архив, не собирая дерево в памяти
+    sink = XmlzSink(filename)
+    sink.open(get_headers(data))
+    sink.write_items(iter_row_items(data))
+    sink.close()
 
 
 @execution_time
 def read_compressed_xml(filename):
+    return list(iter_compressed_xml(filename))
+
+
+def iter_compressed_xml(filename) -> Iterator[dict[str, str]]:
+    """Потоково читаем строки из архива, освобождая разобранные элементы"""
     with zipfile.ZipFile(filename, "r") as zf:
         with zf.open("data.xml") as f:
-            tree = etree.parse(f)
-            root = tree.getroot()
-
-            data = []
-            for row_elem in root.findall("row"):
+            for _, row_elem in etree.iterparse(f, events=("end",), tag="row"):
                 row_data = {}
-                for cell in row_elem.findall("cell"):
+                for cell in row_elem.iterchildren("cell"):
                     row_data[cell.get("name")] = cell.text
-                data.append(row_data)
+                yield row_data
+
+                # Удаляем обработанную строку и уже прочитанные соседние
+                row_elem.clear()
+                while row_elem.getprevious() is not None:
+                    del row_elem.getparent()[0]
 
-            return data
+
+def packb_rows(data) -> bytes:
+    """Упаковываем строки как список словарей, не создавая словари для TableData"""
+    if not isinstance(data, TableData):
+        return msgpack.packb(data)
+
+    packer = msgpack.Packer(autoreset=False)
+    packer.pack_array_header(len(data))
+    for items in iter_row_items(data):
+        packer.pack_map_pairs(list(items))
+    return packer.bytes()
 
 
 @execution_time
 def save_data_fast(data, filename):
+    packed = packb_rows(data)
     with open(filename, "wb") as f:
-        msgpack.pack(data, f)
+        f.write(packed)
+    PROFILER.count(rows=len(data), bytes=len(packed))
 
 
 @execution_time
@@ -193,7 +394,7 @@ def read_data_fast(filename):
 
 @execution_time
 def save_compressed_msgpack(data, filename):
-    packed = msgpack.packb(data)
+    packed = packb_rows(data)
     with gzip.open(filename, "wb") as f:
         f.write(packed)
 
@@ -206,10 +407,11 @@ def load_compressed_msgpack(filename):
 
 @execution_time
 def save_lz4_msgpack(data, filename):
-    packed = msgpack.packb(data)
+    packed = packb_rows(data)
     compressed = lz4.frame.compress(packed)
     with open(filename, 'wb') as f:
         f.write(compressed)
+    PROFILER.count(rows=len(data), bytes=len(compressed))
 
 @execution_time
 def load_lz4_msgpack(filename):
@@ -219,5 +421,22 @@ def load_lz4_msgpack(filename):
     return msgpack.unpackb(packed)
 
 
+
+@execution_time
+def save_chunked_msgpack(data, filename, rows_per_block=10_000):
+    headers = get_headers(data)
+    with ChunkedWriter(filename, headers, rows_per_block) as writer:
+        if isinstance(data, TableData):
+            writer.write_rows(data.rows)
+        else:
+            writer.write_rows([record.get(key) for key in headers] for record in data)
+
+
+@execution_time
+def load_chunked_msgpack(filename):
+    with ChunkedReader(filename) as reader:
+        return TableData(reader.columns, list(reader.iter_rows()))
+
+
 if __name__ == "__main__":
     main()
@@ -1,13 +1,30 @@
 import time
 import functools
 
+from core_1.profiling import PROFILER, Span
+
+# Печатать время выполнения функций с execution_time, когда профилировщик
+# выключен (при включенном вызовы записываются интервалами)
+PRINT_TIME = True
+
 
 def execution_time(func):
+    """
+    Если профилировщик включен, записывает вызов функции интервалом в
+    core_1.profiling.PROFILER, иначе печатает время выполнения (при PRINT_TIME)
+    """
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        if PROFILER.enabled:
+            with Span(PROFILER, func.__qualname__, PROFILER.current()):
+                return func(*args, **kwargs)
+        if not PRINT_TIME:
+            return func(*args, **kwargs)
+
+        start_time = time.perf_counter_ns()
         result = func(*args, **kwargs)
-        total_time = round(time.time() - start_time, 4)
+        total_time = round((time.perf_counter_ns() - start_time) / 1e9, 4)
         print(f"Время выполнения `{func.__name__}` - {total_time} сек.")
         return result
 
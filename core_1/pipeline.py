@@ -0,0 +1,283 @@
+"""
+Конвейер с ограниченной памятью: источник -> преобразования -> приемники.
+
+Источник отдает пачки строк, первая строка первой пачки - заголовки
+(как iter_data_from_excel). Заголовки нормализуются один раз, затем каждая
+пачка проходит преобразования и раздается всем приемникам (core_1.sinks).
+
+В параллельном режиме каждый приемник работает в своем потоке с очередью
+ограниченного размера: если приемник не успевает, чтение источника
+приостанавливается, поэтому в памяти не больше queue_size пачек на приемник.
+
+Пример:
+    from core_1.core_test import iter_data_from_excel
+    from core_1.pipeline import Pipeline, convert_columns
+    from core_1.sinks import DatabaseSink, MsgpackSink, XlsxSink
+
+    stats = Pipeline(
+        iter_data_from_excel("book.xlsx", 0),
+        {
+            "db": DatabaseSink("sqlite:///data.db", "people"),
+            "xlsx": XlsxSink("output.xlsx"),
+            "lz4": MsgpackSink("output_lz4.msgpack", compression="lz4"),
+        },
+        transforms=[convert_columns({"Сумма": float})],
+    ).run()
+"""
+
+import queue
+import threading
+import time
+
+from typing import Any, Callable, Iterable, Sequence
+
+from core_1.profiling import PROFILER
+from core_1.table_data import normalize_headers, project_row
+
+# Преобразование пачки: (заголовки, строки) -> строки
+Transform = Callable[[list[str], list], list]
+
+# Признаки конца данных в очереди приемника: все данные переданы / данные
+# оборвались из-за ошибки источника или другого приемника
+_DONE = object()
+_ABORT = object()
+
+
+class Pipeline:
+    """
+    Один проход по источнику с раздачей пачек нескольким приемникам.
+
+    Args:
+        source (Iterable): Пачки строк, первая строка - заголовки
+        sinks (dict): Имя -> приемник с методами open(headers), write(rows), close()
+            и, необязательно, abort() - вызывается вместо close() при ошибке
+        transforms (Sequence): Преобразования пачки по порядку
+        queue_size (int): Сколько пачек может ждать в очереди каждого приемника
+        parallel (bool): Запускать приемники в отдельных потоках
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Sequence[Sequence[Any]]],
+        sinks: dict[str, Any],
+        transforms: Sequence[Transform] = (),
+        queue_size: int = 4,
+        parallel: bool = True,
+    ):
+        self.source = source
+        self.sinks = sinks
+        self.transforms = list(transforms)
+        self.queue_size = queue_size
+        self.parallel = parallel
+
+    def run(self) -> dict:
+        """
+        Выполнить конвейер.
+
+        Returns:
+            dict: Время и количество строк по этапам: source, transforms, sinks
+        """
+        stats = {
+            "source": {"seconds": 0.0, "rows": 0, "batches": 0},
+            "transforms": {_transform_name(func): 0.0 for func in self.transforms},
+            "sinks": {name: {"seconds": 0.0, "rows": 0} for name in self.sinks},
+        }
+        start_time = time.perf_counter()
+
+        with PROFILER.span("pipeline"):
+            batches = self._iter_batches(stats)
+            headers = next(batches, None)
+            if headers is not None:
+                if self.parallel and len(self.sinks) > 1:
+                    self._run_parallel(headers, batches, stats)
+                else:
+                    self._run_serial(headers, batches, stats)
+
+        stats["seconds"] = time.perf_counter() - start_time
+        return stats
+
+    def _iter_batches(self, stats: dict):
+        """Заголовки, затем преобразованные пачки строк"""
+        source_stats = stats["source"]
+        transform_stats = stats["transforms"]
+        headers = positions = None
+
+        batches = iter(self.source)
+        while True:
+            batch_start = time.perf_counter()
+            with PROFILER.span("pipeline.source") as span:
+                batch = next(batches, None)
+                rows = iter(batch) if batch is not None else None
+                if rows is not None and headers is None:
+                    raw_headers = next(rows, None)
+                    if raw_headers is not None:
+                        headers, positions = normalize_headers(raw_headers)
+                if rows is not None and headers is not None:
+                    rows = [project_row(row, positions) for row in rows]
+                    span.count(rows=len(rows))
+            source_stats["seconds"] += time.perf_counter() - batch_start
+            if rows is None:
+                return
+            if headers is None:
+                continue
+            if source_stats["batches"] == 0:
+                yield headers
+
+            source_stats["rows"] += len(rows)
+            source_stats["batches"] += 1
+
+            for func in self.transforms:
+                name = _transform_name(func)
+                transform_start = time.perf_counter()
+                with PROFILER.span(f"pipeline.transform.{name}"):
+                    rows = func(headers, rows)
+                transform_stats[name] += time.perf_counter() - transform_start
+
+            if rows:
+                yield rows
+
+    def _run_serial(self, headers: list[str], batches, stats: dict) -> None:
+        opened = []
+        completed = False
+        try:
+            for sink in self.sinks.values():
+                sink.open(headers)
+                opened.append(sink)
+            for rows in batches:
+                for name, sink in self.sinks.items():
+                    _write(name, sink, rows, stats["sinks"][name])
+            completed = True
+        finally:
+            for sink in opened:
+                _finish(sink, completed)
+
+    def _run_parallel(self, headers: list[str], batches, stats: dict) -> None:
+        errors = []
+        queues = {}
+        threads = []
+        for name, sink in self.sinks.items():
+            queues[name] = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(
+                target=_sink_worker,
+                args=(name, sink, headers, queues[name], stats["sinks"][name], errors),
+                name=f"pipeline-{name}",
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        completed = False
+        try:
+            for rows in batches:
+                # При ошибке приемника прекращаем чтение источника
+                if errors:
+                    break
+                # put блокируется, пока в очереди приемника нет места
+                for sink_queue in queues.values():
+                    sink_queue.put(rows)
+            else:
+                completed = True
+        finally:
+            end = _DONE if completed else _ABORT
+            for sink_queue in queues.values():
+                sink_queue.put(end)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            name, error = errors[0]
+            raise RuntimeError(f"Ошибка приемника {name}") from error
+
+
+def _sink_worker(name, sink, headers, sink_queue, sink_stats, errors) -> None:
+    """Поток приемника: пишет пачки из очереди до признака конца данных"""
+    failed = False
+    opened = False
+    try:
+        sink.open(headers)
+        opened = True
+    except Exception as error:
+        errors.append((name, error))
+        failed = True
+
+    while True:
+        rows = sink_queue.get()
+        if rows is _DONE or rows is _ABORT:
+            break
+        # После ошибки продолжаем вычитывать очередь, чтобы не блокировать источник
+        if failed:
+            continue
+        try:
+            _write(name, sink, rows, sink_stats)
+        except Exception as error:
+            errors.append((name, error))
+            failed = True
+
+    if not opened:
+        return
+    try:
+        _finish(sink, rows is _DONE and not failed)
+    except Exception as error:
+        if not failed:
+            errors.append((name, error))
+
+
+def _finish(sink, completed: bool) -> None:
+    """Закрыть приемник, а если данные оборвались - прервать запись"""
+    abort = getattr(sink, "abort", None)
+    if completed or abort is None:
+        sink.close()
+    else:
+        abort()
+
+
+def _write(name: str, sink, rows: list, sink_stats: dict) -> None:
+    write_start = time.perf_counter()
+    with PROFILER.span(f"pipeline.sink.{name}") as span:
+        written = sink.write(rows)
+        # Приемник может сообщить, сколько строк записал на самом деле
+        if written is None:
+            written = len(rows)
+        span.count(rows=written)
+    sink_stats["seconds"] += time.perf_counter() - write_start
+    sink_stats["rows"] += written
+
+
+def _transform_name(func: Transform) -> str:
+    return getattr(func, "__name__", type(func).__name__)
+
+
+def convert_columns(converters: dict[str, Callable[[Any], Any]]) -> Transform:
+    """
+    Преобразование типов по столбцам: имя столбца -> функция от значения.
+
+    Пустые строки становятся None, значения, которые не удалось
+    преобразовать, остаются как есть.
+    """
+
+    def convert(headers: list[str], rows: list) -> list:
+        columns = [
+            (position, converters[header])
+            for position, header in enumerate(headers)
+            if header in converters
+        ]
+        if not columns:
+            return rows
+
+        result = []
+        for row in rows:
+            row = list(row)
+            for position, converter in columns:
+                value = row[position]
+                if value == "" or value is None:
+                    row[position] = None
+                    continue
+                try:
+                    row[position] = converter(value)
+                except (TypeError, ValueError):
+                    pass
+            result.append(row)
+        return result
+
+    convert.__name__ = "convert_columns"
+    return convert
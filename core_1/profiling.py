@@ -0,0 +1,357 @@
+"""
+Инструментирование: вложенные интервалы (span) с точным временем,
+пиковой памятью и счетчиками строк/байт.
+
+Пример:
+    from core_1.profiling import PROFILER, profile
+
+    PROFILER.enable(trace_memory=True)
+
+    @profile()
+    def load():
+        with PROFILER.span("parse") as span:
+            span.count(rows=1000)
+
+    load()
+    PROFILER.export_json("profile.json")
+    PROFILER.export_chrome_trace("trace.json")  # chrome://tracing, Perfetto
+
+В выключенном состоянии span() возвращает общий пустой объект, а
+декоратор profile сразу вызывает функцию, поэтому инструментирование
+можно оставлять в рабочем коде.
+
+Пиковая память у tracemalloc общая на процесс, поэтому она замеряется только
+для интервалов потока, вызвавшего enable(trace_memory=True). У интервалов
+других потоков peak_bytes остается None.
+"""
+
+import functools
+import json
+import math
+import os
+import random
+import threading
+import time
+import tracemalloc
+
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Span:
+    """Интервал выполнения с временем, пиковой памятью и счетчиками"""
+
+    __slots__ = (
+        "name",
+        "parent",
+        "depth",
+        "thread_id",
+        "start_ns",
+        "end_ns",
+        "counters",
+        "peak_bytes",
+        "_profiler",
+        "_memory_start",
+        "_memory_peak",
+    )
+
+    def __init__(self, profiler: "Profiler", name: str, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.thread_id = threading.get_ident()
+        self.start_ns = 0
+        self.end_ns = 0
+        self.counters: Dict[str, int] = {}
+        self.peak_bytes: Optional[int] = None
+        self._profiler = profiler
+        self._memory_start = 0
+        self._memory_peak = 0
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def count(self, **counters: int) -> None:
+        """Добавить счетчики к интервалу, например count(rows=100, bytes=4096)"""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self) -> "Span":
+        self._profiler._start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._profiler._finish(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "depth": self.depth,
+            "thread_id": self.thread_id,
+            "start_ns": self.start_ns,
+            "duration_ns": self.duration_ns,
+            "peak_bytes": self.peak_bytes,
+            "counters": dict(self.counters),
+        }
+
+
+class _NullSpan:
+    """Пустой интервал для выключенного профилировщика"""
+
+    __slots__ = ()
+
+    def count(self, **counters: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _DurationStats:
+    """
+    Длительности вызовов одного имени: точные количество, сумма и максимум,
+    для перцентилей - равномерная выборка (reservoir) не больше max_samples
+    """
+
+    __slots__ = ("calls", "total_ns", "max_ns", "samples", "max_samples")
+
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.samples: List[int] = []
+        self.max_samples = max_samples
+
+    def add(self, duration_ns: int) -> None:
+        self.calls += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        if len(self.samples) < self.max_samples:
+            self.samples.append(duration_ns)
+        else:
+            # Каждый из calls вызовов остается в выборке с равной вероятностью
+            position = random.randrange(self.calls)
+            if position < self.max_samples:
+                self.samples[position] = duration_ns
+
+
+class Profiler:
+    """
+    Реестр интервалов: хранит последние завершенные интервалы и статистику
+    длительностей по именам. Количество, сумма и максимум считаются по всем
+    вызовам, перцентили - по выборке не больше max_samples длительностей на
+    имя, поэтому память не растет с числом вызовов.
+    """
+
+    def __init__(self, max_spans: int = 100_000, max_samples: int = 10_000):
+        self.enabled = False
+        self.trace_memory = False
+        self._spans = deque(maxlen=max_spans)
+        self._durations: Dict[str, _DurationStats] = defaultdict(
+            lambda: _DurationStats(max_samples)
+        )
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self._memory_thread: Optional[int] = None
+
+    # === Управление ===================================================================
+
+    def enable(self, trace_memory: bool = False) -> None:
+        """
+        Включить сбор; trace_memory - замерять пиковую память через tracemalloc
+        для интервалов текущего потока
+        """
+        self.trace_memory = trace_memory
+        self._memory_thread = threading.get_ident() if trace_memory else None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.trace_memory = False
+        self._memory_thread = None
+
+    def reset(self) -> None:
+        """Очистить накопленные интервалы и статистику"""
+        with self._lock:
+            self._spans.clear()
+            self._durations.clear()
+            self._counters.clear()
+
+    # === Интервалы ====================================================================
+
+    def span(self, name: str):
+        """Контекстный менеджер интервала, вложенные интервалы образуют дерево"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, self.current())
+
+    def current(self) -> Optional[Span]:
+        """Текущий открытый интервал в этом потоке"""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def count(self, **counters: int) -> None:
+        """Добавить счетчики к текущему интервалу"""
+        if self.enabled:
+            span = self.current()
+            if span is not None:
+                span.count(**counters)
+
+    def _start(self, span: Span) -> None:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(span)
+
+        if self._traces_memory(span):
+            current, peak = tracemalloc.get_traced_memory()
+            # Сохраняем пик родителя до сброса, чтобы вложенный замер его не потерял
+            if span.parent is not None:
+                span.parent._memory_peak = max(span.parent._memory_peak, peak)
+            tracemalloc.reset_peak()
+            span._memory_start = span._memory_peak = current
+
+        span.start_ns = time.perf_counter_ns()
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.perf_counter_ns()
+
+        if self._traces_memory(span):
+            _, peak = tracemalloc.get_traced_memory()
+            span._memory_peak = max(span._memory_peak, peak)
+            span.peak_bytes = span._memory_peak - span._memory_start
+            parent = span.parent
+            if parent is not None:
+                parent._memory_peak = max(parent._memory_peak, span._memory_peak)
+            tracemalloc.reset_peak()
+
+        stack = self._local.stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+
+        with self._lock:
+            self._spans.append(span)
+            self._durations[span.name].add(span.duration_ns)
+            totals = self._counters[span.name]
+            for key, value in span.counters.items():
+                totals[key] = totals.get(key, 0) + value
+
+    def _traces_memory(self, span: Span) -> bool:
+        """
+        Замерять ли память интервала: сброс пика tracemalloc действует на весь
+        процесс, поэтому параллельные потоки испортили бы замеры друг друга
+        """
+        return (
+            self.trace_memory
+            and span.thread_id == self._memory_thread
+            and tracemalloc.is_tracing()
+        )
+
+    # === Отчеты =======================================================================
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> Dict[str, dict]:
+        """Статистика по именам: количество вызовов, время и перцентили в мс"""
+        with self._lock:
+            durations = {
+                name: (stats.calls, stats.total_ns, stats.max_ns, sorted(stats.samples))
+                for name, stats in self._durations.items()
+            }
+            counters = {name: dict(values) for name, values in self._counters.items()}
+
+        result = {}
+        for name, (calls, total_ns, max_ns, values) in durations.items():
+            stats = {
+                "calls": calls,
+                "total_ms": total_ns / 1e6,
+                "mean_ms": total_ns / calls / 1e6,
+                "p50_ms": _percentile(values, 50) / 1e6,
+                "p90_ms": _percentile(values, 90) / 1e6,
+                "p99_ms": _percentile(values, 99) / 1e6,
+                "max_ms": max_ns / 1e6,
+            }
+            stats.update(counters.get(name, {}))
+            if "rows" in stats and total_ns:
+                stats["rows_per_s"] = stats["rows"] / (total_ns / 1e9)
+            result[name] = stats
+        return result
+
+    def export_json(self, filename: str) -> None:
+        """Сводка и список интервалов в JSON"""
+        report = {
+            "summary": self.summary(),
+            "spans": [span.to_dict() for span in self.spans()],
+        }
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def export_chrome_trace(self, filename: str) -> None:
+        """Интервалы в формате Chrome Trace Event (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans():
+            args: Dict[str, Any] = dict(span.counters)
+            if span.peak_bytes is not None:
+                args["peak_bytes"] = span.peak_bytes
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.start_ns / 1000,
+                    "dur": span.duration_ns / 1000,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": args,
+                }
+            )
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _percentile(sorted_values: List[int], percent: float) -> int:
+    """Перцентиль методом ближайшего ранга"""
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+# Общий профилировщик процесса, по умолчанию выключен
+PROFILER = Profiler()
+
+
+def profile(name: Optional[str] = None, profiler: Profiler = PROFILER) -> Callable:
+    """Декоратор: вызов функции записывается интервалом с именем функции"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with Span(profiler, span_name, profiler.current()):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
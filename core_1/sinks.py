@@ -0,0 +1,343 @@
+"""
+Потоковые приемники данных: получают заголовки один раз и затем строки
+пачками, не требуя всей таблицы в памяти.
+
+Интерфейс приемника: open(headers), write(rows), close(); rows - любая
+итерация последовательностей значений в порядке заголовков, write может
+вернуть количество фактически записанных строк. Если данные
+оборвались с ошибкой, вместо close() вызывается abort(): файловые приемники
+удаляют недописанный результат, а запись в БД откатывается, чтобы он не
+выглядел полным.
+"""
+
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+import zipfile
+
+from contextlib import ExitStack
+from typing import Any, Iterable, Sequence
+
+import lz4.frame
+import msgpack
+import xlsxwriter
+
+from lxml import etree
+from core_1.BD.model import DynamicTableManager
+from core_1.chunk_format import ChunkedWriter
+
+# Максимальное количество строк на листе Excel
+EXCEL_MAX_ROWS = 1_048_576
+
+
+class DatabaseSink:
+    """
+    Запись в таблицу DynamicTableManager одной транзакцией: соединение
+    держится от open() до close(), при close() транзакция фиксируется, при
+    abort() - откатывается, и недогруженные строки в таблице не остаются.
+
+    При infer_types таблица создается при первой пачке с типами столбцов,
+    выведенными по ней; индексы строятся при закрытии, после загрузки.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        table_name: str,
+        fast_mode: bool = True,
+        column_types: dict | None = None,
+        infer_types: bool = False,
+        indexes: Sequence = (),
+    ):
+        self.db_url = db_url
+        self.table_name = table_name
+        self.fast_mode = fast_mode
+        self.column_types = column_types
+        self.infer_types = infer_types
+        self.indexes = indexes
+        self.rows = 0
+
+    def open(self, headers: Sequence[str]) -> None:
+        self.headers = list(headers)
+        self.manager = DynamicTableManager(self.db_url)
+        self.table = None
+        # Таблицу создаем до первой вставки: DDL идет отдельным соединением
+        if not self.infer_types:
+            self._create_table(None)
+        self._stack = ExitStack()
+        self.connection = self._stack.enter_context(
+            self.manager.load_connection(self.fast_mode)
+        )
+
+    def _create_table(self, sample) -> None:
+        self.table = self.manager.create_table(
+            self.table_name, self.headers, self.column_types, sample, self.indexes
+        )
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> int:
+        headers = self.headers
+        records = [dict(zip(headers, row)) for row in rows]
+        if self.table is None:
+            self._create_table(records)
+        stats = self.manager.bulk_save_data(
+            self.table, records, connection=self.connection
+        )
+        if stats["rows"] != len(records):
+            raise RuntimeError(
+                f"В таблицу {self.table_name} записано {stats['rows']} строк "
+                f"из {len(records)}"
+            )
+        self.rows += stats["rows"]
+        return stats["rows"]
+
+    def close(self) -> None:
+        if self.table is None:
+            self._create_table([])
+        self._stack.close()
+        self.manager.create_indexes(self.table)
+
+    def abort(self) -> None:
+        # Откатываем все пачки загрузки, индексы не строим
+        try:
+            self.connection.rollback()
+        finally:
+            self._stack.close()
+
+
+class XlsxSink:
+    """
+    Запись в xlsx в режиме constant_memory.
+
+    Типы столбцов ("number", "date", "string") задаются или определяются по
+    первому непустому значению каждого столбца; ячейки пишутся
+    типизированными методами. Строки сверх лимита листа Excel переносятся
+    на новые листы.
+    """
+
+    def __init__(self, filename: str, column_types=None, sheet_name=None):
+        self.filename = filename
+        self.column_types = column_types
+        self.sheet_name = sheet_name
+
+    def open(self, headers: Sequence[str]) -> None:
+        self.headers = list(headers)
+        if self.column_types is None:
+            self.column_types = [None] * len(self.headers)
+        else:
+            self.column_types = list(self.column_types)
+        self.workbook = xlsxwriter.Workbook(self.filename, {"constant_memory": True})
+        self.date_format = self.workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        self.sheet_number = 1
+        self.worksheet = self._add_sheet()
+        self.writers = get_excel_writers(
+            self.worksheet, self.column_types, self.date_format
+        )
+        self.row = 0
+
+    def _add_sheet(self):
+        name = self.sheet_name
+        if name is not None and self.sheet_number > 1:
+            name = f"{name}_{self.sheet_number}"[:31]
+        sheet = self.workbook.add_worksheet(name)
+        # Записываем заголовки
+        sheet.write_row(0, 0, self.headers)
+        return sheet
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> None:
+        writers = self.writers
+        for values in rows:
+            self.row += 1
+            if self.row >= EXCEL_MAX_ROWS:
+                self.sheet_number += 1
+                self.worksheet = self._add_sheet()
+                writers = self.writers = get_excel_writers(
+                    self.worksheet, self.column_types, self.date_format
+                )
+                self.row = 1
+
+            row = self.row
+            for col, (writer, value) in enumerate(zip(writers, values)):
+                if value is None or value == "":
+                    continue
+                if writer is None:
+                    # Пустые ячейки до первого значения не записывались,
+                    # поэтому тип столбца можно выбрать по этому значению
+                    self.column_types[col] = infer_excel_type(value)
+                    writer = writers[col] = get_excel_writer(
+                        self.worksheet, self.column_types[col], self.date_format
+                    )
+                writer(row, col, value)
+
+    def close(self) -> None:
+        self.workbook.close()
+
+    def abort(self) -> None:
+        try:
+            self.workbook.close()
+        finally:
+            _remove(self.filename)
+
+
+def infer_excel_type(value) -> str | None:
+    """Определяем тип столбца xlsx по значению, None - по пустому не определить"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "number"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return "date"
+    return "string"
+
+
+def get_excel_writer(worksheet, column_type, date_format):
+    """Типизированный метод записи для столбца"""
+
+    def write_number(row, col, value):
+        try:
+            worksheet.write_number(row, col, float(value))
+        except (TypeError, ValueError):
+            worksheet.write_string(row, col, str(value))
+
+    def write_date(row, col, value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            worksheet.write_datetime(row, col, value, date_format)
+        else:
+            worksheet.write_string(row, col, str(value))
+
+    def write_string(row, col, value):
+        worksheet.write_string(row, col, str(value))
+
+    writers = {"number": write_number, "date": write_date, "string": write_string}
+    return writers[column_type]
+
+
+def get_excel_writers(worksheet, column_types, date_format):
+    """Методы записи для каждого столбца, None - тип столбца еще не известен"""
+    return [
+        None
+        if column_type is None
+        else get_excel_writer(worksheet, column_type, date_format)
+        for column_type in column_types
+    ]
+
+
+class XmlzSink:
+    """Потоковая запись XML в zip архив через etree.xmlfile"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def open(self, headers: Sequence[str]) -> None:
+        self.headers = list(headers)
+        self._stack = ExitStack()
+        zf = self._stack.enter_context(
+            zipfile.ZipFile(self.filename, "w", zipfile.ZIP_DEFLATED)
+        )
+        f = self._stack.enter_context(zf.open("data.xml", "w", force_zip64=True))
+        self._xf = self._stack.enter_context(etree.xmlfile(f, encoding="utf-8"))
+        self._xf.write_declaration()
+        self._stack.enter_context(self._xf.element("data"))
+        self._xf.write("\n")
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> None:
+        headers = self.headers
+        self.write_items(zip(headers, row) for row in rows)
+
+    def write_items(self, rows_items: Iterable[Iterable[tuple[str, Any]]]) -> None:
+        """Записать строки, заданные парами (заголовок, значение)"""
+        for items in rows_items:
+            row_elem = etree.Element("row")
+            for key, value in items:
+                cell = etree.SubElement(row_elem, "cell")
+                cell.set("name", key)
+                cell.text = str(value)
+            self._xf.write(row_elem, pretty_print=True)
+
+    def close(self) -> None:
+        self._stack.close()
+
+    def abort(self) -> None:
+        try:
+            self._stack.close()
+        finally:
+            _remove(self.filename)
+
+
+class MsgpackSink:
+    """
+    Потоковая запись в формат save_data_fast / save_compressed_msgpack /
+    save_lz4_msgpack (msgpack список словарей).
+
+    Количество строк заранее неизвестно, поэтому строки пишутся во временный
+    файл, а при закрытии к ним добавляется заголовок списка и результат
+    сжимается потоково.
+    """
+
+    def __init__(self, filename: str, compression: str | None = None):
+        if compression not in (None, "gzip", "lz4"):
+            raise ValueError(f"Неизвестное сжатие {compression}")
+        self.filename = filename
+        self.compression = compression
+
+    def open(self, headers: Sequence[str]) -> None:
+        self.headers = list(headers)
+        self.rows = 0
+        self._packer = msgpack.Packer()
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        self._tmp = tempfile.NamedTemporaryFile(
+            dir=directory, suffix=".tmp", delete=False
+        )
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> None:
+        headers = self.headers
+        pack_map_pairs = self._packer.pack_map_pairs
+        for row in rows:
+            self._tmp.write(pack_map_pairs(list(zip(headers, row))))
+            self.rows += 1
+
+    def close(self) -> None:
+        self._tmp.close()
+        try:
+            if self.compression == "gzip":
+                output = gzip.open(self.filename, "wb")
+            elif self.compression == "lz4":
+                output = lz4.frame.open(self.filename, "wb")
+            else:
+                output = open(self.filename, "wb")
+            with output, open(self._tmp.name, "rb") as body:
+                output.write(self._packer.pack_array_header(self.rows))
+                shutil.copyfileobj(body, output, 1024 * 1024)
+        finally:
+            os.remove(self._tmp.name)
+
+    def abort(self) -> None:
+        # Итоговый файл еще не создавался, удаляем только временный
+        self._tmp.close()
+        os.remove(self._tmp.name)
+
+
+class ChunkedSink:
+    """Запись в блочный формат chunk_format"""
+
+    def __init__(self, filename: str, rows_per_block: int = 10_000):
+        self.filename = filename
+        self.rows_per_block = rows_per_block
+
+    def open(self, headers: Sequence[str]) -> None:
+        self._writer = ChunkedWriter(self.filename, headers, self.rows_per_block)
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> None:
+        self._writer.write_rows(rows)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def abort(self) -> None:
+        self._writer.abort()
+
+
+def _remove(filename: str) -> None:
+    if os.path.exists(filename):
+        os.remove(filename)
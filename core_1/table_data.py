@@ -0,0 +1,127 @@
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, Sequence
+
+
+def normalize_headers(raw_headers: Sequence[Any]) -> tuple[list[str], list[int]]:
+    """
+    Нормализуем заголовки и убираем дубликаты.
+
+    Заголовок обрезается до первой части `" / "`. Для повторяющихся заголовков
+    сохраняется первая позиция и значение последнего столбца - так же, как при
+    сборке словаря через dict(zip(headers, row)).
+
+    Returns:
+        tuple[list[str], list[int]]: Уникальные заголовки и индексы исходных
+            столбцов, из которых берутся значения
+    """
+    positions = {}
+    for position, header in enumerate(raw_headers):
+        positions[str(header).split(" / ")[0]] = position
+    return list(positions), list(positions.values())
+
+
+class RowView(Mapping):
+    """Представление строки TableData в виде словаря только для чтения"""
+
+    __slots__ = ("_table", "_values")
+
+    def __init__(self, table: "TableData", values: tuple):
+        self._table = table
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._table.index[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.headers)
+
+    def __len__(self) -> int:
+        return len(self._table.headers)
+
+    def keys(self) -> list[str]:
+        return self._table.headers
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        return zip(self._table.headers, self._values)
+
+    def __repr__(self) -> str:
+        return f"RowView({dict(self.items())})"
+
+
+class TableData:
+    """
+    Компактная таблица: один общий список заголовков и строки-кортежи.
+
+    Заменяет список словарей, в котором каждая строка повторяет ключи.
+    Итерация и индексация отдают RowView для совместимости с кодом,
+    работающим со словарями.
+    """
+
+    __slots__ = ("headers", "index", "rows")
+
+    def __init__(self, headers: list[str], rows: list[tuple] | None = None):
+        self.headers = headers
+        self.index = {header: position for position, header in enumerate(headers)}
+        self.rows = rows if rows is not None else []
+
+    @classmethod
+    def from_rows(cls, data: Iterable[Sequence[Any]]) -> "TableData":
+        """Собрать таблицу из строк, первая строка - заголовки"""
+        rows = iter(data)
+        raw_headers = next(rows, None)
+        if raw_headers is None:
+            return cls([])
+
+        headers, positions = normalize_headers(raw_headers)
+        return cls(headers, [project_row(row, positions) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def __getitem__(self, position: int) -> RowView:
+        return RowView(self, self.rows[position])
+
+    def __iter__(self) -> Iterator[RowView]:
+        for values in self.rows:
+            yield RowView(self, values)
+
+    def iter_dicts(self) -> Iterator[dict[str, Any]]:
+        """Строки в виде обычных словарей, создаются по одному при итерации"""
+        headers = self.headers
+        for values in self.rows:
+            yield dict(zip(headers, values))
+
+    def column(self, name: str) -> list:
+        """Значения одного столбца"""
+        position = self.index[name]
+        return [values[position] for values in self.rows]
+
+
+def project_row(row: Sequence[Any], positions: list[int]) -> tuple:
+    """Взять из строки значения по индексам столбцов, недостающие - пустые"""
+    size = len(row)
+    return tuple(row[position] if position < size else "" for position in positions)
+
+
+def iter_row_items(data) -> Iterator[Iterable[tuple[str, Any]]]:
+    """Пары (заголовок, значение) для каждой строки TableData или списка словарей"""
+    if isinstance(data, TableData):
+        headers = data.headers
+        for values in data.rows:
+            yield zip(headers, values)
+    else:
+        for row in data:
+            yield row.items()
+
+
+def get_headers(data) -> list[str]:
+    """Заголовки TableData или первой строки списка словарей"""
+    if isinstance(data, TableData):
+        return data.headers
+    return list(data[0].keys()) if data else []
@@ -1,4 +1,393 @@
+import codecs
+import csv
+import os
+
+import pandas as pd
+
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from get_dat.CalamineLoaderExcel import (
+    COLUMN_TYPES,
+    build_typed_frame,
+    has_leading_zeros,
+)
+from get_dat.ParallelLoaderExcel import SheetBatch, iter_streamed
+
+# Разделители, среди которых выбирается разделитель файла
+DELIMITERS = ";,\t|"
+
+# Сколько байт начала файла используется для определения кодировки и формата
+SAMPLE_BYTES = 1024 * 1024
+
+# Кодировка, на которую переходим, если файл с ASCII началом не читается в utf-8
+FALLBACK_ENCODING = "cp1251"
+
+# Строковые значения логического типа
+_BOOL_VALUES = {
+    "true": True,
+    "1": True,
+    "да": True,
+    "false": False,
+    "0": False,
+    "нет": False,
+}
+
+
 class DataCollector:
+    """
+    Источник данных из CSV файла с тем же форматом строк и пачек, что и
+    CalamineLoaderExcel: первая строка - заголовки, значения - строки.
+
+    Кодировка (utf-8 или cp1251) и разделитель определяются по началу файла.
+    Если в начале только ASCII, файл читается как utf-8, а при первой ошибке
+    декодирования чтение продолжается в cp1251 (ASCII в обеих кодировках
+    одинаков). Файл читается потоково, поэтому память не зависит от его
+    размера.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        encoding: Optional[str] = None,
+        delimiter: Optional[str] = None,
+        errors: str = "strict",
+    ):
+        """
+        Args:
+            file_path (str): Путь к CSV файлу
+            encoding (Optional[str]): Кодировка, по умолчанию определяется
+            delimiter (Optional[str]): Разделитель, по умолчанию определяется
+            errors (str): Обработка ошибок декодирования, как в open()
+        """
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            sample = f.read(SAMPLE_BYTES)
+        self.encoding = encoding or detect_encoding(sample)
+        self.errors = errors
+        # По ASCII началу utf-8 не отличить от cp1251, решаем по ходу чтения
+        self._fallback_encoding = None
+        if encoding is None and self.encoding == "utf-8" and sample.isascii():
+            self._fallback_encoding = FALLBACK_ENCODING
+        self.dialect = sniff_dialect(
+            _decode_sample(sample, self.encoding, errors), delimiter
+        )
+
+    def iter_rows(self) -> Iterator[List[str]]:
+        """
+        Построчно читать файл.
+
+        Короткие строки дополняются пустыми значениями до количества
+        заголовков, как прямоугольная область листа Excel.
+
+        Yields:
+            List[str]: Значения строки
+        """
+        if self._fallback_encoding is None:
+            f = open(
+                self.file_path, encoding=self.encoding, errors=self.errors, newline=""
+            )
+            lines = f
+        else:
+            f = open(self.file_path, "rb")
+            lines = self._decode_lines(f)
+
+        with f:
+            rows = csv.reader(lines, self.dialect)
+            headers = next(rows, None)
+            if headers is None:
+                return
+            yield headers
+
+            width = len(headers)
+            for row in rows:
+                if len(row) < width:
+                    row.extend([""] * (width - len(row)))
+                yield row
+
+    def _decode_lines(self, f) -> Iterator[str]:
+        """
+        Декодировать строки файла в utf-8, а с первой строки, которая в utf-8
+        не читается, - в запасной кодировке. Переход возможен, только пока
+        прочитанная часть - ASCII, иначе ошибка пробрасывается.
+        """
+        encoding = self.encoding
+        ascii_only = True
+        for line in f:
+            try:
+                text = line.decode(encoding, self.errors)
+            except UnicodeDecodeError:
+                if not ascii_only or self._fallback_encoding is None:
+                    raise
+                # Запоминаем кодировку, следующие чтения идут сразу в ней
+                encoding = self.encoding = self._fallback_encoding
+                self._fallback_encoding = None
+                text = line.decode(encoding, self.errors)
+            if ascii_only and not line.isascii():
+                ascii_only = False
+            yield text
+
+    def iter_batches(self, batch_size: int = 10_000) -> Iterator[List[List[str]]]:
+        """
+        Читать файл пачками строк.
+
+        Args:
+            batch_size (int): Количество строк в пачке
+
+        Yields:
+            List[List[str]]: Очередная пачка строк
+        """
+        if batch_size <= 0:
+            raise ValueError("Размер пачки должен быть больше нуля")
+
+        rows = self.iter_rows()
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    def get_data(self) -> List[List[str]]:
+        """Получить все строки файла"""
+        return list(self.iter_rows())
+
+    def get_typed_data(
+        self,
+        dtypes: Optional[Dict[str, str]] = None,
+        header_row: int = 0,
+        sample_size: int = 1_000,
+        batch_size: int = 50_000,
+        decimal: str = ".",
+    ) -> pd.DataFrame:
+        """
+        Получить данные файла в виде столбцов с типами, как
+        CalamineLoaderExcel.get_typed_data.
+
+        Тип столбца выводится по первым `sample_size` непустым значениям
+        (числа, ISO даты, остальное - строки, в том числе коды с ведущими
+        нулями вроде "007") либо задается в `dtypes`.
+        Значение, не приводимое к типу столбца, вызывает ValueError.
+
+        Args:
+            dtypes (Optional[Dict[str, str]]): Типы столбцов по имени заголовка,
+                допустимые значения - COLUMN_TYPES
+            header_row (int): Индекс строки с заголовками
+            sample_size (int): Количество строк для вывода типов
+            batch_size (int): Количество строк, преобразуемых за раз
+            decimal (str): Десятичный разделитель чисел (например, "," для
+                выгрузок с разделителем ";")
+
+        Returns:
+            pd.DataFrame: Данные файла с типизированными столбцами
+        """
+        dtypes = dtypes or {}
+        for name, dtype in dtypes.items():
+            if dtype not in COLUMN_TYPES:
+                raise ValueError(f"Неизвестный тип `{dtype}` для столбца `{name}`")
+
+        rows = self.iter_rows()
+        for _ in range(header_row):
+            next(rows, None)
+        headers = next(rows, [])
+
+        return build_typed_frame(
+            headers,
+            rows,
+            batch_size,
+            lambda batch: _resolve_text_types(
+                headers, batch, dtypes, sample_size, decimal
+            ),
+            lambda batch, column_types: _prepare_batch(batch, column_types, decimal),
+        )
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    Определить кодировку по началу файла: utf-8 (в том числе с BOM) или cp1251.
+
+    Args:
+        sample (bytes): Начало файла
+
+    Returns:
+        str: Имя кодировки
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: последний символ мог быть обрезан границей выборки
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def sniff_dialect(sample: str, delimiter: Optional[str] = None) -> type:
+    """
+    Определить формат CSV по началу файла.
+
+    Args:
+        sample (str): Начало файла
+        delimiter (Optional[str]): Заданный разделитель
+
+    Returns:
+        type: Диалект для csv.reader
+    """
+    # Последняя строка выборки может быть обрезана
+    lines = sample.splitlines(keepends=True)
+    if len(lines) > 1:
+        sample = "".join(lines[:-1])
+
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=delimiter or DELIMITERS)
+    except csv.Error:
+        # Однородных строк мало: берем самый частый разделитель в заголовке
+        first_line = lines[0] if lines else ""
+
+        class dialect(csv.excel):
+            pass
+
+        dialect.delimiter = delimiter or max(DELIMITERS, key=first_line.count)
+
+    # Sniffer может ошибиться с кавычками, в выгрузках используется стандартная
+    dialect.doublequote = True
+    return dialect
+
+
+def iter_parallel_files(
+    file_paths: List[str],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    batch_size: int = 10_000,
+    encoding: Optional[str] = None,
+    delimiter: Optional[str] = None,
+    queue_size: int = 4,
+) -> Iterator[SheetBatch]:
+    """
+    Параллельно прочитать несколько CSV файлов в пуле процессов.
+
+    Результат в формате iter_parallel_sheets: имя листа - имя файла. Пачки
+    отдаются в порядке `file_paths`, одновременно в работе не больше
+    `max_in_flight` файлов, и каждый файл передает не больше `queue_size`
+    пачек вперед, поэтому память не зависит от размера файлов.
+
+    Args:
+        file_paths (List[str]): Пути к CSV файлам
+        max_workers (Optional[int]): Количество процессов (по умолчанию - число ядер)
+        max_in_flight (Optional[int]): Максимум файлов в работе
+            (по умолчанию - удвоенное количество процессов)
+        batch_size (int): Количество строк в пачке
+        encoding (Optional[str]): Кодировка, по умолчанию определяется по файлу
+        delimiter (Optional[str]): Разделитель, по умолчанию определяется по файлу
+        queue_size (int): Сколько готовых пачек файла может ждать чтения
+
+    Yields:
+        SheetBatch: Очередная сжатая пачка строк (распаковка - decode_batch)
+    """
+    tasks = (
+        (file_path, batch_size, encoding, delimiter) for file_path in file_paths
+    )
+
+    number = 0
+    previous = None
+    for index, task, data in iter_streamed(
+        tasks, _file_batches, max_workers, max_in_flight, queue_size
+    ):
+        number = number + 1 if index == previous else 0
+        previous = index
+        yield SheetBatch(task[0], os.path.basename(task[0]), number, data)
+
+
+def _file_batches(
+    file_path: str, batch_size: int, encoding: Optional[str], delimiter: Optional[str]
+) -> Iterator[List[List[str]]]:
+    """Пачки строк файла в отдельном процессе"""
+    yield from DataCollector(file_path, encoding, delimiter).iter_batches(batch_size)
+
+
+def _decode_sample(sample: bytes, encoding: str, errors: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    return decoder.decode(sample, final=False)
+
+
+def _infer_text_type(values: List[str], decimal: str) -> str:
+    """Определить тип столбца по строковым значениям"""
+    found = set()
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        if has_leading_zeros(value):
+            return "string"
+        number = value.replace(decimal, ".") if decimal != "." else value
+        try:
+            int(number)
+            found.add("int")
+            continue
+        except ValueError:
+            pass
+        try:
+            float(number)
+            found.add("float")
+            continue
+        except ValueError:
+            pass
+        # Даты - только ISO формат, чтобы не принять за дату произвольный текст
+        if value[:4].isdigit() and value[4:5] == "-":
+            try:
+                pd.Timestamp(value)
+                found.add("datetime")
+                continue
+            except ValueError:
+                pass
+        return "string"
+
+    if not found:
+        return "string"
+    if found <= {"int"}:
+        return "int"
+    if found <= {"int", "float"}:
+        return "float"
+    if found == {"datetime"}:
+        return "datetime"
+    return "string"
+
+
+def _resolve_text_types(
+    headers: List[str],
+    batch: List[List[str]],
+    dtypes: Dict[str, str],
+    sample_size: int,
+    decimal: str,
+) -> List[str]:
+    """Получить типы всех столбцов: заданные явно или выведенные по выборке"""
+    sample = batch[:sample_size]
+    result = []
+    for position, header in enumerate(headers):
+        if header in dtypes:
+            result.append(dtypes[header])
+        else:
+            values = [row[position] for row in sample if position < len(row)]
+            result.append(_infer_text_type(values, decimal))
+    return result
+
+
+def _prepare_batch(batch: List[List], column_types: List[str], decimal: str) -> None:
+    """Подготовить строки к преобразованию: десятичный разделитель и bool"""
+    numeric = []
+    if decimal != ".":
+        numeric = [
+            position
+            for position, dtype in enumerate(column_types)
+            if dtype in ("int", "float")
+        ]
+    bools = [position for position, dtype in enumerate(column_types) if dtype == "bool"]
+    if not numeric and not bools:
+        return
 
-    def __init__(self):
-        pass
+    width = len(column_types)
+    for row in batch:
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        for position in numeric:
+            row[position] = row[position].replace(decimal, ".")
+        for position in bools:
+            # Неизвестное значение оставляем как есть: преобразование сообщит о нем
+            value = row[position]
+            row[position] = _BOOL_VALUES.get(value.strip().lower(), value)
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+
+from typing import List, Optional, Union
+
+from get_dat.CalamineLoaderExcel import CalamineLoaderExcel
+from get_dat.ParallelLoaderExcel import decode_batch, encode_batch
+
+CACHE_SUFFIX = ".msgpack.lz4"
+
+# Версия формата записей: входит в ключ, чтобы не читать записи старого формата
+# (в версии 1 даты хранились строками)
+CACHE_VERSION = 2
+
+
+class ExcelParseCache:
+    """
+    Дисковый кэш разобранных листов Excel.
+
+    Ключ записи - путь, размер и время изменения файла (и, по желанию, хэш
+    содержимого) плюс выбранный лист. Данные хранятся в формате lz4 + msgpack,
+    поэтому при попадании в кэш чтение листа - одна распаковка вместо разбора
+    XLSX. Размер кэша ограничен, при переполнении удаляются записи, к которым
+    дольше всего не обращались.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 1024**3,
+        use_content_hash: bool = False,
+    ):
+        """
+        Args:
+            cache_dir (str): Каталог для файлов кэша
+            max_bytes (int): Максимальный суммарный размер кэша в байтах
+            use_content_hash (bool): Добавлять в ключ хэш содержимого файла
+                (надежнее, но требует прочитать файл целиком)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.use_content_hash = use_content_hash
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_sheet_data(
+        self, file_path: str, sheet: Union[str, int], as_str: bool = True
+    ) -> List[List]:
+        """
+        Получить данные листа из кэша или разобрать файл и сохранить в кэш.
+
+        Args:
+            file_path (str): Путь к Excel файлу
+            sheet (Union[str, int]): Имя или индекс листа
+            as_str (bool): Преобразовывать ячейки в строки
+
+        Returns:
+            List[List]: Данные листа в виде списка списков
+        """
+        cache_path = self._cache_path(file_path, sheet, as_str)
+
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                data = decode_batch(f.read())
+            # Отмечаем обращение для вытеснения по LRU
+            os.utime(cache_path)
+            return data
+
+        data = self._parse_sheet(file_path, sheet, as_str)
+        self._store(cache_path, encode_batch(data))
+        return data
+
+    def invalidate(self, file_path: str) -> int:
+        """
+        Удалить из кэша все записи для указанного файла.
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        prefix = _hash_text(os.path.abspath(file_path)) + "_"
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(CACHE_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Удалить все записи кэша"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _cache_path(self, file_path: str, sheet: Union[str, int], as_str: bool) -> str:
+        """Путь к файлу кэша: хэш пути к книге + хэш полного ключа"""
+        abs_path = os.path.abspath(file_path)
+        stat = os.stat(abs_path)
+        key_parts = [
+            abs_path,
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+            f"{type(sheet).__name__}:{sheet}",
+            str(as_str),
+            str(CACHE_VERSION),
+        ]
+        if self.use_content_hash:
+            key_parts.append(_hash_file(abs_path))
+
+        name = f"{_hash_text(abs_path)}_{_hash_text('|'.join(key_parts))}{CACHE_SUFFIX}"
+        return os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def _parse_sheet(file_path: str, sheet: Union[str, int], as_str: bool) -> List[List]:
+        """Разобрать лист из файла"""
+        cal_manager = CalamineLoaderExcel(file_path)
+        if isinstance(sheet, int):
+            worksheet = cal_manager.get_sheet_by_index(sheet)
+        else:
+            worksheet = cal_manager.get_sheet_by_name(sheet)
+        if worksheet is None:
+            raise ValueError(f"Лист {sheet} не найден")
+        return list(cal_manager.iter_rows(worksheet, as_str))
+
+    def _store(self, cache_path: str, data: bytes) -> None:
+        """Атомарно записать запись кэша и освободить место при переполнении"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict(keep=cache_path)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Удалять самые давно использованные записи, пока кэш больше лимита"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+
+
+def _hash_text(text: str) -> str:
+    """Короткий хэш строки для имени файла кэша"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Хэш содержимого файла, читаем по частям"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
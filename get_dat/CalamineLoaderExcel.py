@@ -1,7 +1,15 @@
+import datetime
 import fnmatch
 
+import numpy as np
+import pandas as pd
+
+from itertools import islice
 from python_calamine import CalamineWorkbook, CalamineSheet
-from typing import List, Union, Optional
+from typing import Callable, Dict, Iterator, List, Union, Optional
+
+# Поддерживаемые типы столбцов для get_typed_data
+COLUMN_TYPES = ("int", "float", "datetime", "bool", "string", "category")
 
 
 class CalamineLoaderExcel:
@@ -44,6 +52,22 @@ class CalamineLoaderExcel:
             return self.workbook.get_sheet_by_index(index)
         return None
 
+    def get_sheet_names_by_patterns(self, patterns: List[str]) -> List[str]:
+        """
+        Получить имена листов, соответствующих заданным маскам.
+
+        Args:
+            patterns (List[str]): Список масок (например: ["Sheet*", "Data*"])
+
+        Returns:
+            List[str]: Имена найденных листов в порядке следования в книге
+        """
+        return [
+            sheet_name
+            for sheet_name in self.get_sheet_names()
+            if any(fnmatch.fnmatch(sheet_name, pattern) for pattern in patterns)
+        ]
+
     def get_sheets_by_patterns(self, patterns: List[str]) -> List[CalamineSheet]:
         """
         Получить листы, соответствующие заданным маскам.
@@ -54,16 +78,12 @@ class CalamineLoaderExcel:
         Returns:
             List[Worksheet]: Список найденных листов
         """
-        sheets = self.get_sheet_names()
         matching_sheets = []
 
-        for sheet_name in sheets:
-            for pattern in patterns:
-                if fnmatch.fnmatch(sheet_name, pattern):
-                    worksheet = self.workbook.get_sheet_by_name(sheet_name)
-                    if worksheet:
-                        matching_sheets.append(worksheet)
-                    break
+        for sheet_name in self.get_sheet_names_by_patterns(patterns):
+            worksheet = self.workbook.get_sheet_by_name(sheet_name)
+            if worksheet:
+                matching_sheets.append(worksheet)
 
         return matching_sheets
 
@@ -111,14 +131,289 @@ class CalamineLoaderExcel:
         if hasattr(self, 'workbook'):
             self.workbook.close()
 
+    @staticmethod
+    def iter_rows(sheet: CalamineSheet, as_str: bool = False) -> Iterator[List]:
+        """
+        Построчно читать данные листа, не материализуя весь лист в памяти.
+
+        Строки выравниваются так же, как в `to_python(skip_empty_area=False)`:
+        пустые столбцы слева от области данных заполняются пустыми строками.
+
+        Args:
+            sheet (CalamineSheet): Лист
+            as_str (bool): Преобразовывать ячейки в строки по мере чтения
+
+        Yields:
+            List: Очередная строка листа
+        """
+        if sheet.start is None:
+            return
+
+        pad = [""] * sheet.start[1]
+        for row in sheet.iter_rows():
+            if as_str:
+                yield [str(cell) for cell in pad + row]
+            else:
+                yield pad + row
+
+    @staticmethod
+    def iter_batches(
+        sheet: CalamineSheet, batch_size: int = 10_000, as_str: bool = False
+    ) -> Iterator[List[List]]:
+        """
+        Читать данные листа пачками фиксированного размера.
+
+        Args:
+            sheet (CalamineSheet): Лист
+            batch_size (int): Количество строк в пачке
+            as_str (bool): Преобразовывать ячейки в строки по мере чтения
+
+        Yields:
+            List[List]: Пачка строк (последняя может быть короче)
+        """
+        if batch_size <= 0:
+            raise ValueError("Размер пачки должен быть больше нуля")
+
+        batch = []
+        for row in CalamineLoaderExcel.iter_rows(sheet, as_str):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     @staticmethod
     def get_data(sheet: CalamineSheet):
-        result = sheet.to_python(skip_empty_area=False)
+        # Преобразование данных в строки по мере чтения, без промежуточной копии
+        return list(CalamineLoaderExcel.iter_rows(sheet, as_str=True))
+
+    @staticmethod
+    def get_typed_data(
+        sheet: CalamineSheet,
+        dtypes: Optional[Dict[str, str]] = None,
+        header_row: int = 0,
+        sample_size: int = 1_000,
+        batch_size: int = 50_000,
+    ) -> pd.DataFrame:
+        """
+        Получить данные листа в виде столбцов с сохранением типов.
+
+        Числовые столбцы становятся массивами NumPy (int64/float64, либо Int64
+        при пропусках), даты - datetime64, текст - pandas string. Тип столбца
+        выводится по первым `sample_size` непустым значениям, либо задается
+        в `dtypes`. Дробные числа в целом столбце расширяют его до float, а
+        значение, не приводимое к типу столбца (например, текст в числовом
+        столбце после выборки), вызывает ValueError с именем столбца - такой
+        столбец нужно задать в `dtypes` как "string".
+
+        Args:
+            sheet (CalamineSheet): Лист
+            dtypes (Optional[Dict[str, str]]): Типы столбцов по имени заголовка,
+                допустимые значения - COLUMN_TYPES
+            header_row (int): Индекс строки с заголовками
+            sample_size (int): Количество строк для вывода типов
+            batch_size (int): Количество строк, преобразуемых за раз
+
+        Returns:
+            pd.DataFrame: Данные листа с типизированными столбцами
+
+        Raises:
+            ValueError: Неизвестный тип в `dtypes` или значение, не приводимое
+                к типу столбца
+        """
+        dtypes = dtypes or {}
+        for name, dtype in dtypes.items():
+            if dtype not in COLUMN_TYPES:
+                raise ValueError(f"Неизвестный тип `{dtype}` для столбца `{name}`")
+
+        rows = CalamineLoaderExcel.iter_rows(sheet)
+        for _ in range(header_row):
+            next(rows, None)
+        headers = [str(cell) for cell in next(rows, [])]
+
+        return build_typed_frame(
+            headers,
+            rows,
+            batch_size,
+            lambda batch: _resolve_types(headers, batch, dtypes, sample_size),
+        )
+
+
+def build_typed_frame(
+    headers: List[str],
+    rows: Iterator[List],
+    batch_size: int,
+    resolve_types: Callable[[List[List]], List[str]],
+    prepare: Optional[Callable[[List[List], List[str]], None]] = None,
+) -> pd.DataFrame:
+    """
+    Собрать DataFrame с типизированными столбцами из строк данных.
+
+    Строки преобразуются пачками по `batch_size`, типы столбцов определяются
+    по первой пачке. Общая часть get_typed_data для Excel и CSV.
+
+    Args:
+        headers (List[str]): Заголовки столбцов
+        rows (Iterator[List]): Строки данных без заголовков
+        batch_size (int): Количество строк, преобразуемых за раз
+        resolve_types (Callable): Типы столбцов (значения COLUMN_TYPES)
+            по первой пачке строк
+        prepare (Optional[Callable]): Подготовка пачки на месте перед
+            преобразованием, получает пачку и типы столбцов
+
+    Returns:
+        pd.DataFrame: Данные с типизированными столбцами
+
+    Raises:
+        ValueError: Значение, не приводимое к типу столбца
+    """
+    chunks = []
+    column_types = None
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch and chunks:
+            break
+        if column_types is None:
+            column_types = resolve_types(batch)
+        if prepare is not None:
+            prepare(batch, column_types)
+        chunks.append(_convert_batch(headers, batch, column_types))
+        if len(batch) < batch_size:
+            break
+
+    result = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+    # Категории собираем после склейки, чтобы у всех пачек был общий словарь
+    for position, dtype in enumerate(column_types):
+        if dtype == "category":
+            result[position] = result[position].astype("category")
+
+    result.columns = headers
+    return result
+
+
+def has_leading_zeros(text: str) -> bool:
+    """
+    Ведущие нули ("007", "-01") - признак кода, а не числа: при выводе типов
+    такие значения остаются текстом
+    """
+    digits = text.lstrip("+-")
+    return len(digits) > 1 and digits[0] == "0" and digits[1].isdigit()
+
+
+def _infer_type(values: List) -> str:
+    """Определить тип столбца по выборке значений"""
+    found = set()
+    for value in values:
+        if value == "" or value is None:
+            continue
+        if isinstance(value, bool):
+            found.add("bool")
+        elif isinstance(value, int):
+            found.add("int")
+        elif isinstance(value, float):
+            found.add("int" if value.is_integer() else "float")
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            found.add("datetime")
+        else:
+            return "string"
+
+    if not found:
+        return "string"
+    if found <= {"int"}:
+        return "int"
+    if found <= {"int", "float"}:
+        return "float"
+    if len(found) == 1:
+        return found.pop()
+    return "string"
+
+
+def _resolve_types(
+    headers: List[str], batch: List[List], dtypes: Dict[str, str], sample_size: int
+) -> List[str]:
+    """Получить типы всех столбцов: заданные явно или выведенные по выборке"""
+    sample = batch[:sample_size]
+    result = []
+    for position, header in enumerate(headers):
+        if header in dtypes:
+            result.append(dtypes[header])
+        else:
+            values = [row[position] for row in sample if position < len(row)]
+            result.append(_infer_type(values))
+    return result
+
+
+def _convert_column(
+    values: List, dtype: str, name: str = ""
+) -> Union[np.ndarray, pd.api.extensions.ExtensionArray]:
+    """
+    Преобразовать значения столбца в массив указанного типа.
+
+    Raises:
+        ValueError: Непустое значение не приводится к типу столбца
+    """
+    if dtype in ("int", "float"):
+        source = pd.Series(_blank_to_none(values), dtype=object)
+        series = pd.to_numeric(source, errors="coerce")
+        _check_converted(source, series, name, dtype)
+        if dtype == "float":
+            return series.to_numpy(dtype=np.float64)
+        if (series.dropna() % 1 != 0).any():
+            # Дробные значения в целом столбце: расширяем столбец до float,
+            # чтобы не терять числа (тип выводится по первой пачке)
+            return series.to_numpy(dtype=np.float64)
+        if series.isna().any():
+            # Пропуски: целочисленный тип с поддержкой NA
+            return series.astype("Int64").array
+        return series.to_numpy(dtype=np.int64)
+    if dtype == "datetime":
+        source = pd.Series(_blank_to_none(values), dtype=object)
+        # ISO8601: формат не выводится по первому значению, поэтому
+        # "2024-01-01" и "2024-01-01 10:00" в одном столбце разбираются оба
+        series = pd.to_datetime(source, errors="coerce", format="ISO8601")
+        _check_converted(source, series, name, dtype)
+        return series.to_numpy()
+    if dtype == "bool":
+        values = _blank_to_none(values)
+        for value in values:
+            if value is not None and not isinstance(value, bool):
+                raise _conversion_error(value, name, dtype)
+        return pd.array(values, dtype="boolean")
+    return pd.array(
+        [None if value is None else str(value) for value in _blank_to_none(values)],
+        dtype="string",
+    )
+
+
+def _check_converted(source: pd.Series, result: pd.Series, name: str, dtype: str):
+    """Проверить, что все непустые значения преобразовались"""
+    failed = result.isna().to_numpy() & source.notna().to_numpy()
+    if failed.any():
+        raise _conversion_error(source[failed.argmax()], name, dtype)
+
+
+def _conversion_error(value, name: str, dtype: str) -> ValueError:
+    return ValueError(
+        f"Значение {value!r} столбца `{name}` не приводится к типу `{dtype}`, "
+        f"тип столбца можно задать в dtypes"
+    )
+
 
-        # Преобразование данных в строки
+def _blank_to_none(values: List) -> List:
+    """Заменить пустые ячейки на None"""
+    return [None if isinstance(value, str) and value == "" else value for value in values]
 
-        for r, row in enumerate(result):
-            for c, cell in enumerate(row):
-                result[r][c] = str(cell)
 
-        return result
+def _convert_batch(
+    headers: List[str], batch: List[List], column_types: List[str]
+) -> pd.DataFrame:
+    """Преобразовать пачку строк в DataFrame с позиционными столбцами"""
+    columns = {}
+    for position, dtype in enumerate(column_types):
+        values = [row[position] if position < len(row) else "" for row in batch]
+        columns[position] = _convert_column(
+            values, "string" if dtype == "category" else dtype, headers[position]
+        )
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(batch)))
@@ -0,0 +1,290 @@
+import fnmatch
+import os
+import sqlite3
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from python_calamine import CalamineWorkbook, SheetVisibleEnum
+
+from get_dat.CacheExcel import _hash_file
+
+# Расширения книг, которые умеет читать calamine
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xlsb", ".xls", ".ods")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    scanned_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS sheets (
+    file_id INTEGER NOT NULL REFERENCES files(file_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    visible INTEGER NOT NULL,
+    start_row INTEGER,
+    start_col INTEGER,
+    rows INTEGER,
+    columns INTEGER,
+    PRIMARY KEY (file_id, position)
+);
+CREATE INDEX IF NOT EXISTS ix_sheets_name ON sheets(name);
+"""
+
+_SHEETS_QUERY = (
+    "SELECT f.path, s.name, s.position, s.visible, s.start_row, s.start_col, "
+    "s.rows, s.columns FROM sheets s JOIN files f ON f.file_id = s.file_id"
+)
+
+
+class SheetInfo(NamedTuple):
+    """Лист книги из каталога"""
+
+    path: str
+    sheet_name: str
+    position: int
+    visible: bool
+    start_row: Optional[int]
+    start_col: Optional[int]
+    rows: Optional[int]
+    columns: Optional[int]
+
+
+class ExcelCatalog:
+    """
+    Каталог книг Excel в небольшом индексе SQLite.
+
+    Для каждой книги хранятся путь, размер, время изменения, хэш содержимого,
+    имена листов и их размеры. Повторное сканирование каталога открывает
+    только новые и измененные (по размеру и времени изменения) файлы, а
+    поиск листов по маскам выполняется по индексу без открытия книг.
+
+    Пример:
+        catalog = ExcelCatalog("catalog.db")
+        catalog.scan(r"D:\\Данные")
+        for info in catalog.find_sheets(["Инспекции*"]):
+            print(info.path, info.sheet_name, info.rows)
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path (str): Путь к файлу индекса SQLite
+        """
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ExcelCatalog":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def scan(
+        self,
+        root: str,
+        extensions: Tuple[str, ...] = EXCEL_EXTENSIONS,
+        max_workers: Optional[int] = None,
+        with_dimensions: bool = True,
+        with_hash: bool = True,
+        remove_missing: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Просканировать дерево каталогов и обновить индекс.
+
+        Книги разбираются параллельно в отдельных процессах.
+
+        Args:
+            root (str): Корневой каталог
+            extensions (Tuple[str, ...]): Расширения файлов книг
+            max_workers (Optional[int]): Количество процессов (по умолчанию -
+                по числу CPU)
+            with_dimensions (bool): Определять размеры листов (требует разбора
+                каждого листа, без этого читается только список листов)
+            with_hash (bool): Считать хэш содержимого файла
+            remove_missing (bool): Удалить из индекса книги из root, которых
+                больше нет на диске
+
+        Returns:
+            Dict[str, int]: Количество просканированных, неизмененных,
+                удаленных файлов и файлов с ошибками
+        """
+        root = os.path.abspath(root)
+        found = dict(_iter_workbook_files(root, extensions))
+        prefix = os.path.join(root, "")
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.connection.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        }
+        changed = [path for path, stat in found.items() if known.get(path) != stat]
+
+        stats = {
+            "scanned": 0,
+            "unchanged": len(found) - len(changed),
+            "removed": 0,
+            "errors": 0,
+        }
+        if changed:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    _scan_workbook,
+                    changed,
+                    [with_dimensions] * len(changed),
+                    [with_hash] * len(changed),
+                    chunksize=max(1, len(changed) // 64),
+                )
+                with self.connection:
+                    for path, result in zip(changed, results):
+                        self._store(path, found[path], result)
+                        stats["scanned"] += 1
+                        stats["errors"] += result["error"] is not None
+
+        if remove_missing:
+            missing = [path for path in known if path not in found]
+            with self.connection:
+                self.connection.executemany(
+                    "DELETE FROM files WHERE path = ?", [(path,) for path in missing]
+                )
+            stats["removed"] = len(missing)
+        return stats
+
+    def _store(self, path: str, stat: Tuple[int, int], result: dict) -> None:
+        """Заменить запись книги и ее листов"""
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        cursor = self.connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, hash, scanned_at, error) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, *stat, result["hash"], time.time(), result["error"]),
+        )
+        self.connection.executemany(
+            "INSERT INTO sheets (file_id, position, name, visible, start_row, "
+            "start_col, rows, columns) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid, *sheet) for sheet in result["sheets"]],
+        )
+
+    def find_sheets(
+        self, patterns: List[str], path_pattern: Optional[str] = None
+    ) -> List[SheetInfo]:
+        """
+        Найти листы, соответствующие маскам, во всех книгах каталога.
+
+        Маски сравниваются так же, как в get_sheet_names_by_patterns
+        CalamineLoaderExcel: fnmatch применяется к уникальным именам листов, а
+        строки выбираются по индексу имен.
+
+        Args:
+            patterns (List[str]): Список масок (например: ["Sheet*", "Data*"])
+            path_pattern (Optional[str]): Маска пути книги
+
+        Returns:
+            List[SheetInfo]: Листы в порядке путей книг и листов в книге
+        """
+        names = [
+            name
+            for (name,) in self.connection.execute("SELECT DISTINCT name FROM sheets")
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+        ]
+
+        result = []
+        for start in range(0, len(names), 900):
+            chunk = names[start : start + 900]
+            rows = self.connection.execute(
+                f"{_SHEETS_QUERY} WHERE s.name IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            result.extend(
+                _sheet_info(row)
+                for row in rows
+                if path_pattern is None or fnmatch.fnmatch(row[0], path_pattern)
+            )
+        result.sort(key=lambda info: (info.path, info.position))
+        return result
+
+    def find_files(
+        self, patterns: List[str], path_pattern: Optional[str] = None
+    ) -> List[str]:
+        """Пути книг, в которых есть листы, соответствующие маскам"""
+        return list(
+            dict.fromkeys(info.path for info in self.find_sheets(patterns, path_pattern))
+        )
+
+    def get_sheets(self, path: str) -> List[SheetInfo]:
+        """Листы книги из каталога"""
+        rows = self.connection.execute(
+            f"{_SHEETS_QUERY} WHERE f.path = ? ORDER BY s.position",
+            (os.path.abspath(path),),
+        )
+        return [_sheet_info(row) for row in rows]
+
+    def get_errors(self) -> Dict[str, str]:
+        """Книги, которые не удалось прочитать при сканировании: путь -> ошибка"""
+        return dict(
+            self.connection.execute(
+                "SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path"
+            )
+        )
+
+
+def _sheet_info(row: tuple) -> SheetInfo:
+    path, name, position, visible, *dimensions = row
+    return SheetInfo(path, name, position, bool(visible), *dimensions)
+
+
+def _iter_workbook_files(
+    root: str, extensions: Tuple[str, ...]
+) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """Пути книг в дереве каталогов с размером и временем изменения"""
+    extensions = tuple(extension.lower() for extension in extensions)
+    for directory, _, file_names in os.walk(root):
+        for file_name in file_names:
+            # ~$ - файлы блокировки открытых в Excel книг
+            if file_name.startswith("~$") or not file_name.lower().endswith(extensions):
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, (stat.st_size, stat.st_mtime_ns)
+
+
+def _scan_workbook(file_path: str, with_dimensions: bool, with_hash: bool) -> dict:
+    """Прочитать список и размеры листов книги в отдельном процессе"""
+    result = {"hash": None, "sheets": [], "error": None}
+    try:
+        if with_hash:
+            result["hash"] = _hash_file(file_path)
+        workbook = CalamineWorkbook.from_path(file_path)
+        try:
+            for position, metadata in enumerate(workbook.sheets_metadata):
+                visible = metadata.visible == SheetVisibleEnum.Visible
+                start_row = start_col = rows = columns = None
+                if with_dimensions:
+                    sheet = workbook.get_sheet_by_index(position)
+                    rows, columns = sheet.height, sheet.width
+                    if sheet.start is not None:
+                        start_row, start_col = sheet.start
+                result["sheets"].append(
+                    (position, metadata.name, visible, start_row, start_col)
+                    + (rows, columns)
+                )
+        finally:
+            workbook.close()
+    except Exception as error:
+        result["sheets"] = []
+        result["error"] = f"{type(error).__name__}: {error}"
+    return result
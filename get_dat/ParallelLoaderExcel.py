@@ -0,0 +1,229 @@
+import datetime
+import multiprocessing
+import os
+import queue
+
+import lz4.frame
+import msgpack
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from get_dat.CalamineLoaderExcel import CalamineLoaderExcel
+
+
+# Сколько секунд ждать места в очереди пачек перед проверкой признака остановки
+_PUT_TIMEOUT = 0.1
+
+
+class SheetBatch(NamedTuple):
+    """Очередная пачка строк листа, сжатая lz4 + msgpack"""
+
+    file_path: str
+    sheet_name: str
+    number: int
+    data: bytes
+
+
+def encode_batch(batch: List[List]) -> bytes:
+    """Упаковать пачку строк в msgpack и сжать lz4"""
+    return lz4.frame.compress(msgpack.packb(batch, default=_encode_default))
+
+
+def decode_batch(data: bytes) -> List[List]:
+    """Распаковать пачку строк, упакованную encode_batch"""
+    return msgpack.unpackb(lz4.frame.decompress(data), ext_hook=_decode_ext)
+
+
+# Коды расширений msgpack для дат и интервалов
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_TIME = 3
+_EXT_TIMEDELTA = 4
+
+
+def _encode_default(value):
+    """
+    Даты и интервалы, которые msgpack не умеет упаковывать, пишем
+    расширениями, чтобы decode_batch вернул те же объекты
+    """
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, datetime.time):
+        return msgpack.ExtType(_EXT_TIME, value.isoformat().encode())
+    if isinstance(value, datetime.timedelta):
+        parts = [value.days, value.seconds, value.microseconds]
+        return msgpack.ExtType(_EXT_TIMEDELTA, msgpack.packb(parts))
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается msgpack")
+
+
+def _decode_ext(code: int, data: bytes):
+    if code == _EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return datetime.date.fromisoformat(data.decode())
+    if code == _EXT_TIME:
+        return datetime.time.fromisoformat(data.decode())
+    if code == _EXT_TIMEDELTA:
+        return datetime.timedelta(*msgpack.unpackb(data))
+    return msgpack.ExtType(code, data)
+
+
+def _sheet_batches(
+    file_path: str, sheet_name: str, batch_size: int, as_str: bool
+) -> Iterator[List[List]]:
+    """Пачки строк листа в отдельном процессе, каждый процесс открывает свою книгу"""
+    cal_manager = CalamineLoaderExcel(file_path)
+    sheet = cal_manager.get_sheet_by_name(sheet_name)
+    yield from cal_manager.iter_batches(sheet, batch_size, as_str)
+
+
+def _stream_task(produce: Callable, args: tuple, batches, stop) -> None:
+    """
+    Выполнить задачу в процессе пула: сжатые пачки produce(*args) кладутся в
+    ограниченную очередь batches, в конце - None, при ошибке - исключение.
+    Если потребитель прекратил чтение (stop), задача завершается.
+    """
+    try:
+        for batch in produce(*args):
+            if not _put(batches, encode_batch(batch), stop):
+                return
+    except Exception as error:
+        _put(batches, error, stop)
+        return
+    _put(batches, None, stop)
+
+
+def _put(batches, item, stop) -> bool:
+    """Положить элемент в очередь, ожидая места; False - чтение прекращено"""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(batches, future) -> Iterator[bytes]:
+    """Сжатые пачки одной задачи из ее очереди до признака конца"""
+    while True:
+        try:
+            item = batches.get(timeout=_PUT_TIMEOUT)
+        except queue.Empty:
+            # Процесс пула мог упасть, не положив признак конца
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+            continue
+        if item is None:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def iter_streamed(
+    tasks: Iterable[tuple],
+    produce: Callable,
+    max_workers: Optional[int],
+    max_in_flight: Optional[int],
+    queue_size: int,
+) -> Iterator[Tuple[int, tuple, bytes]]:
+    """
+    Выполнить задачи в пуле процессов и отдать их пачки по порядку задач.
+
+    У каждой задачи своя очередь на `queue_size` пачек: процесс, опередивший
+    потребителя, ждет места в очереди. Поэтому в памяти одновременно не
+    больше `max_in_flight` * `queue_size` сжатых пачек, как бы ни были велики
+    листы и файлы.
+
+    Yields:
+        Tuple[int, tuple, bytes]: Номер задачи, ее аргументы и очередная сжатая
+            пачка
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    if max_in_flight <= 0:
+        raise ValueError("Количество задач в работе должно быть больше нуля")
+    if queue_size <= 0:
+        raise ValueError("Размер очереди пачек должен быть больше нуля")
+
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        stop = manager.Event()
+        in_flight = deque()
+        try:
+            for index, task in enumerate(tasks):
+                if len(in_flight) >= max_in_flight:
+                    yield from _iter_task(*in_flight.popleft())
+                batches = manager.Queue(queue_size)
+                future = executor.submit(_stream_task, produce, task, batches, stop)
+                in_flight.append((index, task, batches, future))
+            while in_flight:
+                yield from _iter_task(*in_flight.popleft())
+        finally:
+            # Досрочный выход: задачи в процессах перестают ждать места в очереди
+            stop.set()
+            for *_, future in in_flight:
+                future.cancel()
+
+
+def _iter_task(
+    index: int, task: tuple, batches, future
+) -> Iterator[Tuple[int, tuple, bytes]]:
+    """Пачки одной задачи вместе с ее номером и аргументами"""
+    for data in _drain(batches, future):
+        yield index, task, data
+
+
+def iter_parallel_sheets(
+    file_paths: List[str],
+    patterns: List[str],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    batch_size: int = 10_000,
+    as_str: bool = True,
+    queue_size: int = 4,
+) -> Iterator[SheetBatch]:
+    """
+    Параллельно разобрать листы из нескольких книг в пуле процессов.
+
+    Пачки отдаются в детерминированном порядке: по порядку книг в `file_paths`,
+    внутри книги - по порядку листов, внутри листа - по порядку строк.
+    Одновременно в работе не больше `max_in_flight` листов, и каждый лист
+    передает пачки через очередь на `queue_size` пачек, поэтому память
+    ограничена независимо от числа книг и размера листов.
+
+    Args:
+        file_paths (List[str]): Пути к Excel файлам
+        patterns (List[str]): Маски имен листов (например: ["Sheet*", "Data*"])
+        max_workers (Optional[int]): Количество процессов (по умолчанию - число ядер)
+        max_in_flight (Optional[int]): Максимум листов в работе
+            (по умолчанию - удвоенное количество процессов)
+        batch_size (int): Количество строк в пачке
+        as_str (bool): Преобразовывать ячейки в строки
+        queue_size (int): Сколько готовых пачек листа может ждать чтения
+
+    Yields:
+        SheetBatch: Очередная сжатая пачка строк (распаковка - decode_batch)
+    """
+    tasks = (
+        (file_path, sheet_name, batch_size, as_str)
+        for file_path in file_paths
+        for sheet_name in CalamineLoaderExcel(file_path).get_sheet_names_by_patterns(
+            patterns
+        )
+    )
+
+    number = 0
+    previous = None
+    for index, task, data in iter_streamed(
+        tasks, _sheet_batches, max_workers, max_in_flight, queue_size
+    ):
+        number = number + 1 if index == previous else 0
+        previous = index
+        yield SheetBatch(task[0], task[1], number, data)
@@ -1,6 +1,14 @@
 from collections import defaultdict
 import pandas as pd
-from typing import Dict, Set, Any
+from typing import Dict, Set, Any, Tuple
+
+from lineage import (
+    ColumnLineage,
+    FrameLineage,
+    IncrementalGroupSum,
+    SourceIdTable,
+    tracked_groupby,
+)
 
 
 class IDTracker:
@@ -58,6 +66,55 @@ def process_data_with_tracking(data: list, value_mapping: Dict[str, float], grou
     return df, tracker
 
 
+def map_values_with_lineage(
+    data: list, value_mapping: Dict[str, float]
+) -> Tuple[pd.DataFrame, FrameLineage]:
+    """
+    Векторная замена ID значениями с сохранением происхождения.
+
+    Вместо обхода ячеек через iterrows каждый столбец заменяется через
+    Series.map, а ID источников сохраняются целочисленными кодами рядом
+    с DataFrame (FrameLineage), позиции строк совпадают с позициями в df.
+    """
+    df = pd.DataFrame(data)
+    id_table = SourceIdTable(value_mapping)
+    columns = {}
+
+    for col in df.columns:
+        keys = df[col].astype(str)
+        codes = id_table.lookup(keys)
+        is_mapped = codes >= 0
+        if not is_mapped.any():
+            continue
+
+        mapped = keys.map(value_mapping)
+        df[col] = mapped if is_mapped.all() else mapped.where(is_mapped, df[col])
+        columns[col] = ColumnLineage.from_row_codes(codes)
+
+    return df, FrameLineage(id_table, columns)
+
+
+def tracked_groupby_sum_incremental(
+    df: pd.DataFrame, lineage: FrameLineage, group_col: str, sum_col: str
+) -> IncrementalGroupSum:
+    """
+    Сумма по группам с происхождением, которую можно обновлять по изменениям
+    строк через apply_delta вместо полного пересчета (ключ строки - метка
+    индекса df)
+    """
+    aggregate = IncrementalGroupSum()
+    sum_lineage = lineage.columns.get(sum_col)
+    groups = df[group_col].tolist()
+    values = df[sum_col].tolist()
+
+    for position, row_key in enumerate(df.index):
+        source_ids = ()
+        if sum_lineage is not None:
+            source_ids = lineage.id_table.decode(sum_lineage.row_codes(position))
+        aggregate.add(row_key, groups[position], values[position], source_ids)
+    return aggregate
+
+
 def tracked_groupby_sum(df: pd.DataFrame, group_col: str, sum_col: str, tracker: IDTracker):
     """Группировка с отслеживанием исходных ID"""
     result = df.groupby(group_col)[sum_col].sum().reset_index()
@@ -116,15 +173,25 @@ test_values = {
 # Указываем все колонки, по которым будем группировать
 df, tracker = process_data_with_tracking(test_data, test_values, ["category", "kat"])
 
+# Векторный вариант: происхождение хранится кодами рядом с DataFrame
+df_fast, lineage = map_values_with_lineage(test_data, test_values)
+print("Источники по категориям (векторный вариант):")
+for category, positions in df_fast.groupby("category").indices.items():
+    ids = sorted(lineage.source_ids("amount", positions))
+    print(f"Категория {category}: {df_fast['amount'].iloc[positions].sum()} из ID: {ids}")
+
 # Первая группировка по category
 grouped_by_category = tracked_groupby_sum(df, "category", "amount", tracker)
 
-# Вторая группировка по kat (с тем же df и tracker)
-grouped_by_kat = tracked_groupby_sum(grouped_by_category, "kat", "amount", tracker)
+# Цепочка группировок с происхождением по группам: (kat, category) -> kat
+grouped, grouped_lineage = tracked_groupby(
+    df_fast, lineage, ["kat", "category"], "amount"
+)
+grouped_by_kat, kat_lineage = tracked_groupby(grouped, grouped_lineage, "kat", "amount")
 
 # Проверки для kat
 print("\nГруппировка по kat:")
-for kat in ["q1", "q2"]:
-    sum_value = grouped_by_kat.loc[grouped_by_kat["kat"] == kat, "amount"].iloc[0]
-    ids = tracker.get_source_ids(sum_value, "amount", f"kat:{kat}")
-    print(f"Значение {sum_value} для kat {kat} собрано из ID: {ids}")
\ No newline at end of file
+for position, kat in enumerate(grouped_by_kat["kat"]):
+    sum_value = grouped_by_kat["amount"].iloc[position]
+    ids = sorted(kat_lineage.source_ids("amount", position))
+    print(f"Значение {sum_value} для kat {kat} собрано из ID: {ids}")
@@ -1,3 +1,21 @@
+import os
+import sys
+
+import numpy as np
+
+# Пакет core_1 лежит в корне репозитория, а не рядом с примерами
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_1.BD.connector import CachedDBConnector
+from lineage import IncrementalGroupSum, SourceIdTable
+
+# Общая таблица интернирования ID для CompactTrackedValue по умолчанию
+DEFAULT_ID_TABLE = SourceIdTable()
+
+# После скольких отложенных массивов кодов они объединяются
+PENDING_MERGE_LIMIT = 64
+
+
 class TrackedValue:
     def __init__(self, value, source_ids):
         self.value = value
@@ -12,20 +30,125 @@ class TrackedValue:
         return f"Value({self.value})[from {len(self.source_ids)} sources]"
 
 
+class CompactTrackedValue:
+    """
+    Отслеживаемое значение с компактным хранением ID источников.
+
+    ID хранятся отсортированным массивом уникальных целочисленных кодов
+    из таблицы интернирования. При накоплении через += массивы кодов
+    откладываются и объединяются при обращении к источникам или по
+    достижении PENDING_MERGE_LIMIT, поэтому сумма n значений стоит
+    O(n log n), а не O(n^2).
+
+    += не меняет левое значение: первое += создает новый накопитель, и
+    только он дальше изменяется на месте (как список при +=). Поэтому
+    `result[k] = row[col]; result[k] += ...` не портит исходную таблицу.
+    """
+
+    __slots__ = ("value", "id_table", "_codes", "_pending", "_owned")
+
+    def __init__(self, value, source_ids=(), id_table=None, codes=None):
+        self.value = value
+        self.id_table = id_table if id_table is not None else DEFAULT_ID_TABLE
+        if codes is None:
+            codes = np.unique(self.id_table.encode(source_ids))
+        self._codes = codes
+        self._pending = []
+        self._owned = False
+
+    @property
+    def source_codes(self):
+        """Отсортированные уникальные коды источников"""
+        if self._pending:
+            self._merge_pending()
+        return self._codes
+
+    def _merge_pending(self):
+        self._codes = np.unique(np.concatenate([self._codes, *self._pending]))
+        self._pending = []
+
+    @property
+    def source_ids(self):
+        return set(self.id_table.decode(self.source_codes))
+
+    def _check_table(self, other):
+        if other.id_table is not self.id_table:
+            raise ValueError("Значения используют разные таблицы ID")
+
+    def __add__(self, other):
+        self._check_table(other)
+        return CompactTrackedValue(
+            self.value + other.value,
+            id_table=self.id_table,
+            codes=np.union1d(self.source_codes, other.source_codes),
+        )
+
+    def __iadd__(self, other):
+        self._check_table(other)
+        result = self if self._owned else self._accumulator()
+        result.value += other.value
+        result._pending.append(other.source_codes)
+        if len(result._pending) >= PENDING_MERGE_LIMIT:
+            result._merge_pending()
+        return result
+
+    def _accumulator(self):
+        """Собственная копия для накопления через +="""
+        result = CompactTrackedValue(
+            self.value, id_table=self.id_table, codes=self._codes
+        )
+        result._pending = list(self._pending)
+        result._owned = True
+        return result
+
+    def copy(self):
+        return CompactTrackedValue(
+            self.value, id_table=self.id_table, codes=self.source_codes
+        )
+
+    @classmethod
+    def sum(cls, values, start=0):
+        """Сумма набора значений с одним объединением источников"""
+        values = list(values)
+        if not values:
+            return cls(start)
+        id_table = values[0].id_table
+        for value in values:
+            if value.id_table is not id_table:
+                raise ValueError("Значения используют разные таблицы ID")
+
+        total = start
+        for value in values:
+            total += value.value
+        codes = np.unique(np.concatenate([value.source_codes for value in values]))
+        return cls(total, id_table=id_table, codes=codes)
+
+    def __repr__(self):
+        return f"Value({self.value})[from {len(self.source_codes)} sources]"
+
+
 def create_tracked_table(data_with_ids, db_connector):
     """
     Преобразует таблицу с ID в таблицу с отслеживаемыми значениями
     """
+    values = db_connector.get_values(collect_ids(data_with_ids))
+
     result = []
     for row in data_with_ids:
         tracked_row = {}
         for col, id_value in row.items():
-            real_value = db_connector.get_value(id_value)
-            tracked_row[col] = TrackedValue(real_value, [id_value])
+            tracked_row[col] = TrackedValue(values[id_value], [id_value])
         result.append(tracked_row)
     return result
 
 
+def collect_ids(data_with_ids) -> list:
+    """Уникальные ID всех ячеек таблицы в порядке появления"""
+    return list(
+        dict.fromkeys(id_value for row in data_with_ids for id_value in row.values())
+    )
+
+
 class MockDBConnector:
     def __init__(self):
         """
@@ -70,18 +193,25 @@ class MockDBConnector:
             "id_11": {"filename": "categories.csv", "row": 3, "created_at": "2024-02-17"}
         }
 
+        # Единый индекс ID -> таблица, чтобы не проверять таблицы по очереди
+        self.id_index = {}
+        for table in (self.products, self.sales, self.categories):
+            self.id_index.update(dict.fromkeys(table, table))
+
     def get_value(self, id):
         """
         Получает значение по ID из соответствующей таблицы
         """
-        if id in self.products:
-            return self.products[id]
-        elif id in self.sales:
-            return self.sales[id]
-        elif id in self.categories:
-            return self.categories[id]
-        else:
+        table = self.id_index.get(id)
+        if table is None:
             raise ValueError(f"ID {id} not found in any table")
+        return table[id]
+
+    def get_values(self, ids):
+        """
+        Получает значения для набора ID
+        """
+        return {id: self.get_value(id) for id in ids}
 
     def get_metadata(self, id):
         """
@@ -92,6 +222,12 @@ class MockDBConnector:
         else:
             raise ValueError(f"Metadata for ID {id} not found")
 
+    def get_metadata_many(self, ids):
+        """
+        Получает метаданные для набора ID
+        """
+        return {id: self.get_metadata(id) for id in ids}
+
 
 # Пример использования
 def group_and_sum(tracked_table, group_by_col, sum_col):
@@ -105,6 +241,30 @@ def group_and_sum(tracked_table, group_by_col, sum_col):
     return result
 
 
+def group_and_sum_incremental(tracked_table, group_by_col, sum_col):
+    """
+    Группировка с суммированием, результат обновляется по изменениям строк
+    через IncrementalGroupSum.apply_delta (ключ строки - ее номер в таблице)
+    """
+    aggregate = IncrementalGroupSum()
+    for i, row in enumerate(tracked_table):
+        aggregate.add(
+            i, row[group_by_col].value, row[sum_col].value, row[sum_col].source_ids
+        )
+    return aggregate
+
+
+def group_and_sum_compact(tracked_table, group_by_col, sum_col):
+    """Группировка с суммированием CompactTrackedValue, одно объединение на группу"""
+    groups = {}
+    for row in tracked_table:
+        groups.setdefault(row[group_by_col].value, []).append(row[sum_col])
+    return {
+        group_key: CompactTrackedValue.sum(values)
+        for group_key, values in groups.items()
+    }
+
+
 # Пример использования
 def test_mock_db():
     # Создаем экземпляр MockDBConnector
@@ -118,16 +278,8 @@ def test_mock_db():
         {"product": "id_4", "sales": "id_8", "category": "id_11"}
     ]
 
-    # Преобразуем данные с помощью TrackedValue
-    tracked_table = []
-    for row in test_data:
-        tracked_row = {}
-        for column, id_value in row.items():
-            real_value = connector.get_value(id_value)
-            tracked_row[column] = TrackedValue(real_value, [id_value])
-        tracked_table.append(tracked_row)
-
-    return tracked_table
+    # Преобразуем данные с помощью TrackedValue (значения - одним пакетом)
+    return create_tracked_table(test_data, CachedDBConnector(connector))
 
 
 # Пример данных
@@ -140,4 +292,14 @@ result = group_and_sum(tracked_table, "category", "sales")
 # Получаем исходные ID для результата
 for group_key, tracked_value in result.items():
     print(f"Group {group_key}: {tracked_value.value}")
-    print(f"Source IDs: {tracked_value.source_ids}")
\ No newline at end of file
+    print(f"Source IDs: {tracked_value.source_ids}")
+
+# Компактный вариант: ID источников хранятся кодами
+compact_table = [
+    {col: CompactTrackedValue(value.value, value.source_ids) for col, value in row.items()}
+    for row in tracked_table
+]
+compact_result = group_and_sum_compact(compact_table, "category", "sales")
+for group_key, tracked_value in compact_result.items():
+    print(f"Group {group_key}: {tracked_value!r}")
+    print(f"Source IDs: {sorted(tracked_value.source_ids)}")
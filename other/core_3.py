@@ -1,4 +1,12 @@
-from core_2 import MockDBConnector
+import os
+import sys
+
+# Пакет core_1 лежит в корне репозитория, а не рядом с примерами
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_1.BD.connector import CachedDBConnector
+from core_2 import MockDBConnector, collect_ids
+from lineage import IncrementalGroupSum
 
 
 def create_tracked_table(data_with_ids, db_connector):
@@ -7,12 +15,13 @@ def create_tracked_table(data_with_ids, db_connector):
     """
     values_table = []  # Список словарей с реальными значениями
     sources_table = []  # Список словарей с source_ids
+    values = db_connector.get_values(collect_ids(data_with_ids))
 
     for row in data_with_ids:
         values_row = {}
         sources_row = {}
         for col, id_value in row.items():
-            values_row[col] = db_connector.get_value(id_value)
+            values_row[col] = values[id_value]
             sources_row[col] = {id_value}  # Используем множество для source_ids
         values_table.append(values_row)
         sources_table.append(sources_row)
@@ -42,9 +51,25 @@ def group_and_sum(values_table, sources_table, group_by_col, sum_col):
     return result_values, result_sources
 
 
+def group_and_sum_incremental(values_table, sources_table, group_by_col, sum_col):
+    """
+    То же, что group_and_sum, но с возможностью обновлять результат по
+    изменениям строк (ключ строки - ее номер в таблице)
+    """
+    aggregate = IncrementalGroupSum()
+    for i in range(len(values_table)):
+        aggregate.add(
+            i,
+            values_table[i][group_by_col],
+            values_table[i][sum_col],
+            sources_table[i][sum_col],
+        )
+    return aggregate
+
+
 # Пример использования:
 def test_mock_db():
-    connector = MockDBConnector()
+    connector = CachedDBConnector(MockDBConnector())
 
     test_data = [
         {"product": "id_1", "sales": "id_5", "category": "id_9"},
@@ -67,11 +92,37 @@ def test_mock_db():
         print(f"Value: {result_values[group_key]}")
         print(f"Source IDs: {result_sources[group_key]}")
 
-        # Если нужны метаданные
+        # Если нужны метаданные (одним пакетом на группу)
+        metadata_many = connector.get_metadata_many(result_sources[group_key])
         for source_id in result_sources[group_key]:
-            metadata = connector.get_metadata(source_id)
+            metadata = metadata_many[source_id]
             print(f"  From: {metadata['filename']}, row {metadata['row']}")
 
 
 # Выполняем тест
 test_mock_db()
+
+
+# Инкрементальный пересчет: меняется одна строка, пересчитывается одна группа
+def test_incremental():
+    connector = CachedDBConnector(MockDBConnector())
+    test_data = [
+        {"product": "id_1", "sales": "id_5", "category": "id_9"},
+        {"product": "id_2", "sales": "id_6", "category": "id_9"},
+        {"product": "id_3", "sales": "id_7", "category": "id_10"},
+    ]
+    values_table, sources_table = create_tracked_table(test_data, connector)
+    aggregate = group_and_sum_incremental(
+        values_table, sources_table, "category", "sales"
+    )
+
+    # Третья строка перенесена в Electronics, первая удалена
+    changed = aggregate.apply_delta(
+        updated=[(2, "Electronics", 600.0, {"id_7"})], deleted=[0]
+    )
+    for group_key in sorted(changed):
+        print(f"\nGroup {group_key}: {aggregate.sums.get(group_key)}")
+        print(f"Source IDs: {aggregate.source_ids(group_key)}")
+
+
+test_incremental()
@@ -1,6 +1,7 @@
 import pandas as pd
 
-from core_2 import MockDBConnector
+from core_2 import MockDBConnector, collect_ids
+from lineage import ColumnLineage, FrameLineage, SourceIdTable, attach_lineage
 
 
 # Подход 1: Использование attrs
@@ -43,6 +44,28 @@ def create_tracked_dfs(data_with_ids, db_connector):
     return values_df, sources_df
 
 
+# Подход 3: Происхождение в колоночном хранилище (df.lineage)
+def create_tracked_df_with_lineage(data_with_ids, db_connector):
+    """
+    DataFrame значений и CSR хранилище ID источников по столбцам.
+
+    Вместо словаря (строка, столбец) -> множество в attrs хранятся массивы
+    кодов ID, доступные через df.lineage и переживающие фильтрацию, take,
+    concat и группировку через df.lineage.groupby.
+    """
+    values = db_connector.get_values(collect_ids(data_with_ids))
+    df = pd.DataFrame(data_with_ids)
+
+    id_table = SourceIdTable()
+    columns = {}
+    for col in df.columns:
+        ids = df[col].to_numpy()
+        columns[col] = ColumnLineage.from_row_codes(id_table.encode(ids))
+        df[col] = [values[id_value] for id_value in ids]
+
+    return attach_lineage(df, FrameLineage(id_table, columns))
+
+
 # Пример использования:
 connector = MockDBConnector()
 test_data = [
@@ -78,3 +101,11 @@ for category, value in result_df.iterrows():
     print(f"\nCategory: {category}")
     print(f"Total sales: {value['sales']}")
     print(f"Source IDs: {result_df.attrs['sources'][category]}")
+
+# Используем подход с хранилищем происхождения
+tracked_df = create_tracked_df_with_lineage(test_data, connector)
+lineage_result = tracked_df.lineage.groupby("category", "sales")
+for label, row in lineage_result.lineage.data.iterrows():
+    print(f"\nCategory: {row['category']}")
+    print(f"Total sales: {row['sales']}")
+    print(f"Source IDs: {lineage_result.lineage.source_ids('sales', label)}")
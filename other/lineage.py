@@ -0,0 +1,445 @@
+import msgpack
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Sequence, Set, Tuple, Union
+
+# Служебный столбец: позиция строки DataFrame в LineageStore
+LINEAGE_ROW = "_lineage_row_"
+
+# Агрегации, для которых поддерживается отслеживание происхождения
+TRACKED_AGGREGATIONS = ("sum", "mean", "count", "min", "max")
+
+
+class SourceIdTable:
+    """
+    Таблица интернирования ID источников: ID <-> целочисленный код.
+
+    Позволяет хранить происхождение значений массивами int вместо
+    множеств строк.
+    """
+
+    def __init__(self, ids: Iterable[Any] = ()):
+        self._ids: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+        self._index = None
+        self.encode(ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def encode(self, ids: Iterable[Any]) -> np.ndarray:
+        """Получить коды ID, добавляя в таблицу новые"""
+        result = []
+        for source_id in ids:
+            code = self._codes.get(source_id)
+            if code is None:
+                code = len(self._ids)
+                self._codes[source_id] = code
+                self._ids.append(source_id)
+                self._index = None
+            result.append(code)
+        return np.array(result, dtype=np.int64)
+
+    def lookup(self, values: Iterable[Any]) -> np.ndarray:
+        """Векторно получить коды значений, -1 для неизвестных"""
+        if self._index is None:
+            self._index = pd.Index(self._ids)
+        return self._index.get_indexer(pd.Index(values))
+
+    def decode(self, codes: Iterable[int]) -> List[Any]:
+        """Получить ID по кодам"""
+        return [self._ids[code] for code in codes]
+
+    def remap_from(self, other: "SourceIdTable") -> np.ndarray:
+        """Массив перевода кодов другой таблицы в коды этой таблицы"""
+        return self.encode(other._ids)
+
+    @property
+    def ids(self) -> List[Any]:
+        return list(self._ids)
+
+
+class ColumnLineage:
+    """
+    Происхождение значений одного столбца в формате CSR.
+
+    Источники строки i - коды codes[offsets[i]:offsets[i + 1]].
+    """
+
+    __slots__ = ("offsets", "codes")
+
+    def __init__(self, offsets: np.ndarray, codes: np.ndarray):
+        self.offsets = offsets
+        self.codes = codes
+
+    @classmethod
+    def from_row_codes(cls, row_codes: np.ndarray) -> "ColumnLineage":
+        """Один источник на строку, код -1 - строка без источника"""
+        row_codes = np.asarray(row_codes, dtype=np.int64)
+        has_source = row_codes >= 0
+        offsets = np.zeros(len(row_codes) + 1, dtype=np.int64)
+        np.cumsum(has_source, out=offsets[1:])
+        return cls(offsets, row_codes[has_source])
+
+    @classmethod
+    def concat(cls, parts: Sequence["ColumnLineage"]) -> "ColumnLineage":
+        """Склеить происхождение нескольких наборов строк подряд"""
+        offsets = [np.zeros(1, dtype=np.int64)]
+        shift = 0
+        for part in parts:
+            offsets.append(part.offsets[1:] + shift)
+            shift += len(part.codes)
+        codes = [part.codes for part in parts]
+        return cls(
+            np.concatenate(offsets),
+            np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def empty(cls, rows: int) -> "ColumnLineage":
+        """Строки без источников"""
+        return cls(np.zeros(rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row_codes(self, position: int) -> np.ndarray:
+        return self.codes[self.offsets[position] : self.offsets[position + 1]]
+
+    def take(self, positions: np.ndarray) -> "ColumnLineage":
+        """Происхождение для подмножества строк (по позициям)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Индексы кодов: начало каждой строки + смещение внутри строки
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return ColumnLineage(offsets, self.codes[index])
+
+    def group_union(self, labels: np.ndarray, n_groups: int) -> "ColumnLineage":
+        """
+        Объединить источники строк по группам за один проход.
+
+        Args:
+            labels (np.ndarray): Номер группы для каждой строки (0..n_groups-1)
+            n_groups (int): Количество групп
+
+        Returns:
+            ColumnLineage: Строка i результата - уникальные источники группы i
+        """
+        code_groups = np.repeat(np.asarray(labels, dtype=np.int64), np.diff(self.offsets))
+        code_range = int(self.codes.max()) + 1 if len(self.codes) else 1
+        pairs = np.unique(code_groups * code_range + self.codes)
+
+        groups, codes = np.divmod(pairs, code_range)
+        offsets = np.zeros(n_groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(groups, minlength=n_groups), out=offsets[1:])
+        return ColumnLineage(offsets, codes)
+
+
+class FrameLineage:
+    """Происхождение значений DataFrame: общая таблица ID и CSR по столбцам"""
+
+    def __init__(self, id_table: SourceIdTable, columns: Dict[str, ColumnLineage]):
+        self.id_table = id_table
+        self.columns = columns
+
+    def source_ids(self, column: str, positions: Any = None) -> Set[Any]:
+        """
+        ID источников столбца для строк по позициям (по умолчанию - для всех).
+
+        Args:
+            column (str): Имя столбца
+            positions: Позиция строки, массив позиций или None
+        """
+        lineage = self.columns.get(column)
+        if lineage is None:
+            return set()
+        if positions is None:
+            codes = lineage.codes
+        elif np.ndim(positions) == 0:
+            codes = lineage.row_codes(int(positions))
+        else:
+            codes = lineage.take(positions).codes
+        return set(self.id_table.decode(np.unique(codes)))
+
+    def take(self, positions: np.ndarray) -> "FrameLineage":
+        return FrameLineage(
+            self.id_table,
+            {column: lineage.take(positions) for column, lineage in self.columns.items()},
+        )
+
+
+class LineageStore:
+    """
+    Неизменяемое хранилище происхождения для DataFrame.
+
+    Хранится в df.attrs["lineage"], а строки DataFrame ссылаются на него через
+    целочисленный столбец LINEAGE_ROW. Фильтрация, take и concat переносят этот
+    столбец как обычные данные, а pandas при копировании attrs получает
+    тот же объект (deepcopy возвращает self), поэтому происхождение не
+    копируется поячеечно.
+    """
+
+    def __init__(self, lineage: FrameLineage, rows: int):
+        self.lineage = lineage
+        self.rows = rows
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def to_bytes(self) -> bytes:
+        """Сериализовать: таблица ID и массивы CSR по столбцам"""
+        return msgpack.packb(
+            {
+                "rows": self.rows,
+                "ids": self.lineage.id_table.ids,
+                "columns": {
+                    column: [lineage.offsets.tobytes(), lineage.codes.tobytes()]
+                    for column, lineage in self.lineage.columns.items()
+                },
+            }
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LineageStore":
+        payload = msgpack.unpackb(data)
+        columns = {
+            column: ColumnLineage(
+                np.frombuffer(offsets, dtype=np.int64),
+                np.frombuffer(codes, dtype=np.int64),
+            )
+            for column, (offsets, codes) in payload["columns"].items()
+        }
+        return cls(FrameLineage(SourceIdTable(payload["ids"]), columns), payload["rows"])
+
+
+def attach_lineage(df: pd.DataFrame, lineage: FrameLineage) -> pd.DataFrame:
+    """Привязать происхождение к DataFrame, строки lineage соответствуют строкам df"""
+    result = df.copy()
+    result[LINEAGE_ROW] = np.arange(len(df), dtype=np.int64)
+    result.attrs["lineage"] = LineageStore(lineage, len(df))
+    return result
+
+
+def concat_with_lineage(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Склеить DataFrame с разными хранилищами происхождения.
+
+    Кадры с общим хранилищем можно склеивать обычным pd.concat. Результат
+    получает свою таблицу ID, таблицы исходных кадров не меняются.
+    """
+    id_table = SourceIdTable()
+    columns = {}
+    for df in frames:
+        columns.update(dict.fromkeys(df.lineage.store.lineage.columns))
+
+    parts = {column: [] for column in columns}
+    for df in frames:
+        lineage = df.lineage.current()
+        remap = id_table.remap_from(lineage.id_table)
+        for column in columns:
+            part = lineage.columns.get(column)
+            if part is None:
+                part = ColumnLineage.empty(len(df))
+            parts[column].append(ColumnLineage(part.offsets, remap[part.codes]))
+
+    data = pd.concat([df.lineage.data for df in frames])
+    merged = {column: ColumnLineage.concat(part) for column, part in parts.items()}
+    return attach_lineage(data, FrameLineage(id_table, merged))
+
+
+def tracked_groupby(
+    df: pd.DataFrame,
+    lineage: FrameLineage,
+    by: Union[str, List[str]],
+    value_cols: Union[str, List[str]],
+    func: str = "sum",
+) -> Tuple[pd.DataFrame, FrameLineage]:
+    """
+    Группировка с отслеживанием ID источников за один проход.
+
+    Номер группы каждой строки берется из groupby(...).ngroup(), после чего
+    источники всех строк объединяются по группам векторно. Происхождение
+    результата хранится по строкам результата (по группам), а не по значению,
+    поэтому одинаковые суммы разных групп не смешиваются. Результат можно
+    снова передать в tracked_groupby для цепочки группировок.
+
+    Для min/max источниками считаются строки, на которых достигается
+    экстремум, для остальных агрегаций - все непустые строки группы.
+
+    Returns:
+        Tuple[pd.DataFrame, FrameLineage]: Результат группировки и его происхождение
+    """
+    if func not in TRACKED_AGGREGATIONS:
+        raise ValueError(f"Агрегация {func} не поддерживается")
+
+    by = [by] if isinstance(by, str) else list(by)
+    value_cols = [value_cols] if isinstance(value_cols, str) else list(value_cols)
+
+    grouper = df.groupby(by, sort=True, dropna=False)
+    labels = grouper.ngroup().to_numpy()
+    n_groups = grouper.ngroups
+    result = grouper[value_cols].agg(func).reset_index()
+
+    columns = {}
+    for col in by:
+        if col in lineage.columns:
+            columns[col] = lineage.columns[col].group_union(labels, n_groups)
+
+    for col in value_cols:
+        if col not in lineage.columns:
+            continue
+        contributes = df[col].notna().to_numpy()
+        if func in ("min", "max"):
+            extreme = grouper[col].transform(func).to_numpy()
+            contributes &= df[col].to_numpy() == extreme
+        positions = np.flatnonzero(contributes)
+        columns[col] = lineage.columns[col].take(positions).group_union(
+            labels[positions], n_groups
+        )
+
+    return result, FrameLineage(lineage.id_table, columns)
+
+
+@pd.api.extensions.register_dataframe_accessor("lineage")
+class LineageAccessor:
+    """Доступ к происхождению значений через df.lineage"""
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+
+    @property
+    def store(self) -> LineageStore:
+        store = self._df.attrs.get("lineage")
+        if store is None or LINEAGE_ROW not in self._df.columns:
+            raise AttributeError("У DataFrame нет привязанного происхождения")
+        return store
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """DataFrame без служебного столбца"""
+        return self._df.drop(columns=LINEAGE_ROW)
+
+    def positions(self) -> np.ndarray:
+        """Позиции строк DataFrame в хранилище"""
+        return self._df[LINEAGE_ROW].to_numpy()
+
+    def current(self) -> FrameLineage:
+        """Происхождение именно для текущих строк DataFrame (в их порядке)"""
+        return self.store.lineage.take(self.positions())
+
+    def source_ids(self, column: str, label: Any = None) -> Set[Any]:
+        """ID источников столбца для строки с меткой label или для всех строк"""
+        if label is None:
+            positions = self.positions()
+        else:
+            positions = np.atleast_1d(self._df.loc[label, LINEAGE_ROW])
+        return self.store.lineage.source_ids(column, positions)
+
+    def groupby(
+        self,
+        by: Any,
+        value_cols: Any,
+        func: str = "sum",
+    ) -> pd.DataFrame:
+        """
+        Группировка с происхождением по группам, см. tracked_groupby.
+
+        Returns:
+            pd.DataFrame: Результат группировки (ключи - столбцы) с новым
+                хранилищем происхождения
+        """
+        result, lineage = tracked_groupby(
+            self.data, self.current(), by, value_cols, func
+        )
+        return attach_lineage(result, lineage)
+
+
+class IncrementalGroupSum:
+    """
+    Сумма по группам с происхождением, обновляемая по изменениям строк.
+
+    Для каждой строки-источника хранится ее вклад (группа, значение, ID),
+    для каждой группы - сумма, количество строк и счетчик ID источников.
+    Вставка, изменение или удаление строки пересчитывает только затронутые
+    группы, без полного прохода по таблице.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Hashable, Tuple[Any, Any, frozenset]] = {}
+        self.sums: Dict[Any, Any] = {}
+        self.counts: Dict[Any, int] = {}
+        self.sources: Dict[Any, Counter] = {}
+
+    def add(
+        self, row_key: Hashable, group_key: Any, value: Any, source_ids: Iterable
+    ) -> None:
+        """Добавить строку, строка с тем же ключом заменяется"""
+        if row_key in self.rows:
+            self.remove(row_key)
+
+        source_ids = frozenset(source_ids)
+        self.rows[row_key] = (group_key, value, source_ids)
+        if group_key in self.sums:
+            self.sums[group_key] += value
+            self.counts[group_key] += 1
+            self.sources[group_key].update(source_ids)
+        else:
+            self.sums[group_key] = value
+            self.counts[group_key] = 1
+            self.sources[group_key] = Counter(source_ids)
+
+    def remove(self, row_key: Hashable) -> Any:
+        """Удалить строку, возвращает группу, из которой она удалена"""
+        group_key, value, source_ids = self.rows.pop(row_key)
+        self.counts[group_key] -= 1
+        if self.counts[group_key] == 0:
+            # Группа опустела: удаляем целиком, без накопленной погрешности
+            del self.sums[group_key], self.counts[group_key], self.sources[group_key]
+            return group_key
+
+        self.sums[group_key] -= value
+        self.sources[group_key].subtract(source_ids)
+        for source_id in source_ids:
+            if self.sources[group_key][source_id] <= 0:
+                del self.sources[group_key][source_id]
+        return group_key
+
+    def apply_delta(self, inserted=(), updated=(), deleted=()) -> Set[Any]:
+        """
+        Применить изменения строк-источников.
+
+        Args:
+            inserted: Новые строки (row_key, group_key, value, source_ids)
+            updated: Измененные строки в том же формате
+            deleted: Ключи удаленных строк
+
+        Returns:
+            Set[Any]: Группы, сумма или источники которых изменились
+        """
+        changed = set()
+        for row_key in deleted:
+            changed.add(self.remove(row_key))
+        for row_key, group_key, value, source_ids in [*inserted, *updated]:
+            if row_key in self.rows:
+                changed.add(self.remove(row_key))
+            self.add(row_key, group_key, value, source_ids)
+            changed.add(group_key)
+        return changed
+
+    def result(self) -> Dict[Any, Any]:
+        """Текущие суммы по группам"""
+        return dict(self.sums)
+
+    def mean(self, group_key: Any) -> Any:
+        return self.sums[group_key] / self.counts[group_key]
+
+    def source_ids(self, group_key: Any) -> Set[Any]:
+        """ID источников группы"""
+        sources = self.sources.get(group_key)
+        return set(sources) if sources is not None else set()